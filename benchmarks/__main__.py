@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).parent.parent
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the bot against a fake Discord with a synthetic guild.",
+    )
+    parser.add_argument(
+        "scenarios", nargs="*", help="scenarios to run (default: all of them)"
+    )
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--clubs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency", type=float, default=50.0, help="REST API latency in milliseconds"
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, default=50, help="requests per route and window"
+    )
+    parser.add_argument(
+        "--rate-limit-window", type=float, default=1.0, help="in seconds"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=600.0, help="seconds to wait per command"
+    )
+    parser.add_argument(
+        "--cache-profile",
+        choices=("full", "compact"),
+        help="override the cache profile from the default config",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="trace Python allocations for exact peaks (slows everything down)",
+    )
+    parser.add_argument(
+        "--routes", action="store_true", help="show the requests to each route"
+    )
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    parser.add_argument(
+        "--verbose", action="store_true", help="show the bot's info logs"
+    )
+    return parser.parse_args()
+
+
+async def run(options: argparse.Namespace) -> int:
+    """Run the benchmark, returning the exit code."""
+    # Importing the bot loads the config, so only do it once in the work directory.
+    from benchmarks.runner import Benchmark, format_report
+    from benchmarks.scenarios import SCENARIOS
+    from roycemorebot.constants import Channels
+
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    bench = Benchmark(options)
+    try:
+        await bench.start()
+        await bench.command(
+            "subscriptions reload", channel_id=Channels.mod_bot_commands
+        )
+        for name in options.scenarios or SCENARIOS:
+            await bench.run_scenario(name, functools.partial(SCENARIOS[name], bench))
+    finally:
+        await bench.stop()
+
+    print(format_report(bench.results, options.routes))
+    for content, error in bench.errors:
+        print(f"Error in `{content}`: {error!r}", file=sys.stderr)
+
+    if options.json:
+        options.json.write_text(
+            json.dumps([result._asdict() for result in bench.results], indent=2)
+        )
+    return 1 if bench.errors else 0
+
+
+def main() -> int:
+    """Run the benchmark in a temporary work directory."""
+    options = parse_args()
+    if options.json:
+        options.json = options.json.resolve()
+    if options.tracemalloc:
+        tracemalloc.start()
+
+    # The bot reads its config and writes its data and logs in the work directory.
+    os.environ.setdefault("BOT_TOKEN", "benchmark")
+    os.environ.setdefault("DEBUG", "false")
+    with tempfile.TemporaryDirectory(prefix="roycemorebot-bench-") as work_dir:
+        shutil.copy(REPO_DIR / "config-default.json", work_dir)
+        os.chdir(work_dir)
+        if options.cache_profile:
+            Path("config.json").write_text(
+                json.dumps({"cache": {"profile": options.cache_profile}})
+            )
+        sys.path.insert(0, str(REPO_DIR))
+
+        import roycemorebot  # noqa: F401 (sets up logging)
+
+        if not options.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        return asyncio.run(run(options))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,552 @@
+import argparse
+import asyncio
+import collections
+import json
+import time
+import typing
+
+from aiohttp import WSMsgType, web
+
+from benchmarks.synthetic import SyntheticGuild
+
+API_PREFIX = "/api/v7"
+HEARTBEAT_INTERVAL = 41250  # milliseconds
+CHUNK_SIZE = 1000  # members per `GUILD_MEMBERS_CHUNK`
+
+# Gateway opcodes
+DISPATCH = 0
+HEARTBEAT = 1
+IDENTIFY = 2
+REQUEST_MEMBERS = 8
+HELLO = 10
+HEARTBEAT_ACK = 11
+
+
+def _json(data: typing.Any, status: int = 200, **kwargs) -> web.Response:
+    """Return a JSON response, without the charset discord.py doesn't expect."""
+    return web.Response(
+        body=json.dumps(data).encode(),
+        status=status,
+        content_type="application/json",
+        **kwargs,
+    )
+
+
+def _not_found(message: str, code: int) -> web.Response:
+    return _json({"message": message, "code": code}, status=404)
+
+
+class FakeDiscord:
+    """
+    A local stand-in for the Discord REST API and gateway, serving a synthetic guild.
+
+    Every REST request is delayed by `latency` seconds and rate limited per route
+    and major parameter (guild or channel), to `rate_limit` requests every
+    `rate_limit_window` seconds, with the same headers and 429 responses as
+    Discord. Changes made through the REST API are sent back over the gateway as
+    events, so the bot's cache stays up to date like it would in production.
+
+    The `/_bench` endpoints let the benchmark list the members, post messages as
+    any of them, and read and reset the request counts.
+    """
+
+    def __init__(
+        self,
+        guild: SyntheticGuild,
+        latency: float = 0.05,
+        rate_limit: int = 50,
+        rate_limit_window: float = 1.0,
+    ):
+        self.guild = guild
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+
+        self.requests = collections.Counter()  # "METHOD /route" -> count
+        self.rate_limited = 0
+        self._buckets = {}  # (route, major parameter) -> [remaining, reset time]
+        self._sockets = set()
+        self._sequence = 0
+
+        self.app = web.Application(middlewares=[self._api_middleware])
+        api = API_PREFIX
+        members = f"{api}/guilds/{{guild_id}}/members"
+        messages = f"{api}/channels/{{channel_id}}/messages"
+        self.app.add_routes(
+            [
+                web.get("/gateway", self.gateway),
+                web.get(f"{api}/gateway", self.get_gateway),
+                web.get(f"{api}/users/@me", self.get_me),
+                web.post(f"{api}/users/@me/channels", self.create_dm),
+                web.get(members, self.list_members),
+                web.get(f"{members}/{{user_id}}", self.get_member),
+                web.patch(f"{members}/{{user_id}}", self.edit_member),
+                web.put(f"{members}/{{user_id}}/roles/{{role_id}}", self.add_role),
+                web.delete(
+                    f"{members}/{{user_id}}/roles/{{role_id}}", self.remove_role
+                ),
+                web.post(f"{api}/guilds/{{guild_id}}/roles", self.create_role),
+                web.patch(
+                    f"{api}/guilds/{{guild_id}}/roles/{{role_id}}", self.edit_role
+                ),
+                web.delete(
+                    f"{api}/guilds/{{guild_id}}/roles/{{role_id}}", self.delete_role
+                ),
+                web.post(f"{api}/guilds/{{guild_id}}/channels", self.create_channel),
+                web.patch(f"{api}/guilds/{{guild_id}}/channels", self.move_channels),
+                web.patch(f"{api}/channels/{{channel_id}}", self.edit_channel),
+                web.delete(f"{api}/channels/{{channel_id}}", self.delete_channel),
+                web.post(messages, self.send_message),
+                web.post(f"{messages}/bulk-delete", self.no_content),
+                web.patch(f"{messages}/{{message_id}}", self.edit_message),
+                web.delete(f"{messages}/{{message_id}}", self.no_content),
+                web.put(
+                    f"{messages}/{{message_id}}/reactions/{{emoji}}/{{user_id}}",
+                    self.no_content,
+                ),
+                web.delete(
+                    f"{messages}/{{message_id}}/reactions/{{emoji}}/{{user_id}}",
+                    self.no_content,
+                ),
+                web.get("/_bench/members", self.bench_members),
+                web.post("/_bench/messages", self.bench_message),
+                web.get("/_bench/stats", self.bench_stats),
+                web.post("/_bench/reset", self.bench_reset),
+            ]
+        )
+
+    # Rate limits, latency and request counting
+
+    @web.middleware
+    async def _api_middleware(
+        self, request: web.Request, handler: typing.Callable
+    ) -> web.StreamResponse:
+        """Count, delay and rate limit the REST API requests."""
+        if not request.path.startswith(API_PREFIX):
+            return await handler(request)
+
+        resource = request.match_info.route.resource
+        route = resource.canonical[len(API_PREFIX) :] if resource else request.path
+        route = f"{request.method} {route}"
+        self.requests[route] += 1
+
+        major = request.match_info.get("guild_id") or request.match_info.get(
+            "channel_id"
+        )
+        now = time.monotonic()
+        bucket = self._buckets.setdefault((route, major), [self.rate_limit, now])
+        if now >= bucket[1]:
+            bucket[:] = [self.rate_limit, now + self.rate_limit_window]
+        limited = bucket[0] == 0
+        if not limited:
+            bucket[0] -= 1
+
+        reset_after = bucket[1] - now
+        headers = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(bucket[0]),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Bucket": str(hash(route) & 0xFFFFFFFF),
+        }
+        await asyncio.sleep(self.latency)
+
+        if limited:
+            self.rate_limited += 1
+            return _json(
+                {
+                    "message": "You are being rate limited.",
+                    "retry_after": reset_after * 1000,
+                    "global": False,
+                },
+                status=429,
+                headers={**headers, "Via": "1.1 fake"},
+            )
+
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    # Gateway
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        """Serve a gateway connection."""
+        socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        await socket.send_json(
+            {"op": HELLO, "d": {"heartbeat_interval": HEARTBEAT_INTERVAL}}
+        )
+
+        async for message in socket:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            op = payload["op"]
+            if op == HEARTBEAT:
+                # Acknowledging instantly confuses discord.py's latency measurement.
+                await asyncio.sleep(self.latency)
+                await socket.send_json({"op": HEARTBEAT_ACK})
+            elif op == IDENTIFY:
+                self._sockets.add(socket)
+                await self._send_ready(socket)
+            elif op == REQUEST_MEMBERS:
+                await self._send_member_chunks(socket, payload["d"])
+
+        self._sockets.discard(socket)
+        return socket
+
+    async def _send_event(
+        self, socket: web.WebSocketResponse, event: str, data: dict
+    ) -> None:
+        self._sequence += 1
+        await socket.send_json(
+            {"op": DISPATCH, "t": event, "s": self._sequence, "d": data}
+        )
+
+    async def dispatch(self, event: str, data: dict) -> None:
+        """Send an event to every connected client."""
+        for socket in list(self._sockets):
+            await self._send_event(socket, event, data)
+
+    async def _send_ready(self, socket: web.WebSocketResponse) -> None:
+        """Send `READY` and the guild, like Discord does after identifying."""
+        await self._send_event(
+            socket,
+            "READY",
+            {
+                "v": 6,
+                "user": self.guild.bot_user,
+                "guilds": [{"id": str(self.guild.id), "unavailable": True}],
+                "session_id": "benchmark",
+                "private_channels": [],
+                "relationships": [],
+            },
+        )
+        await self._send_event(socket, "GUILD_CREATE", self.guild.payload(False))
+
+    async def _send_member_chunks(
+        self, socket: web.WebSocketResponse, request: dict
+    ) -> None:
+        """Answer a request for guild members."""
+        if "user_ids" in request:
+            user_ids = request["user_ids"]
+            if not isinstance(user_ids, list):
+                user_ids = [user_ids]
+            members = [
+                self.guild.members[int(user_id)]
+                for user_id in user_ids
+                if int(user_id) in self.guild.members
+            ]
+        else:
+            query = request.get("query", "").lower()
+            members = [
+                member
+                for member in self.guild.members.values()
+                if member["user"]["username"].lower().startswith(query)
+            ]
+            if request.get("limit"):
+                members = members[: request["limit"]]
+
+        chunks = [
+            members[i : i + CHUNK_SIZE] for i in range(0, len(members), CHUNK_SIZE)
+        ] or [[]]
+        for index, chunk in enumerate(chunks):
+            await self._send_event(
+                socket,
+                "GUILD_MEMBERS_CHUNK",
+                {
+                    "guild_id": str(self.guild.id),
+                    "members": chunk,
+                    "chunk_index": index,
+                    "chunk_count": len(chunks),
+                    "nonce": request.get("nonce"),
+                },
+            )
+
+    # REST API
+
+    async def no_content(self, request: web.Request) -> web.Response:
+        """Accept a request that Discord answers with no content."""
+        return web.Response(status=204)
+
+    async def get_gateway(self, request: web.Request) -> web.Response:
+        """Return the gateway URL."""
+        return _json({"url": f"ws://{request.host}/gateway"})
+
+    async def get_me(self, request: web.Request) -> web.Response:
+        """Return the bot's user."""
+        return _json(self.guild.bot_user)
+
+    async def create_dm(self, request: web.Request) -> web.Response:
+        """Open a DM channel with a member."""
+        body = await request.json()
+        recipient_id = int(body["recipient_id"])
+        if recipient_id not in self.guild.members:
+            return _not_found("Unknown User", 10013)
+        return _json(self.guild.dm_channel(recipient_id))
+
+    async def list_members(self, request: web.Request) -> web.Response:
+        """List the guild's members, in pages ordered by ID."""
+        limit = int(request.query.get("limit", 1))
+        after = int(request.query.get("after", 0))
+        member_ids = sorted(id_ for id_ in self.guild.members if id_ > after)
+        return _json([self.guild.members[id_] for id_ in member_ids[:limit]])
+
+    def _member(self, request: web.Request) -> typing.Optional[dict]:
+        return self.guild.members.get(int(request.match_info["user_id"]))
+
+    async def _member_updated(self, member: dict) -> None:
+        await self.dispatch(
+            "GUILD_MEMBER_UPDATE", {"guild_id": str(self.guild.id), **member}
+        )
+
+    async def get_member(self, request: web.Request) -> web.Response:
+        """Return a member."""
+        member = self._member(request)
+        if member is None:
+            return _not_found("Unknown Member", 10007)
+        return _json(member)
+
+    async def edit_member(self, request: web.Request) -> web.Response:
+        """Edit a member's roles or nickname."""
+        member = self._member(request)
+        if member is None:
+            return _not_found("Unknown Member", 10007)
+
+        body = await request.json()
+        if "roles" in body:
+            member["roles"] = [str(role_id) for role_id in body["roles"]]
+        if "nick" in body:
+            member["nick"] = body["nick"]
+        await self._member_updated(member)
+        return _json(member)
+
+    async def add_role(self, request: web.Request) -> web.Response:
+        """Give a member a role."""
+        member = self._member(request)
+        if member is None:
+            return _not_found("Unknown Member", 10007)
+
+        role_id = request.match_info["role_id"]
+        if role_id not in member["roles"]:
+            member["roles"].append(role_id)
+            await self._member_updated(member)
+        return web.Response(status=204)
+
+    async def remove_role(self, request: web.Request) -> web.Response:
+        """Take a role from a member."""
+        member = self._member(request)
+        if member is None:
+            return _not_found("Unknown Member", 10007)
+
+        role_id = request.match_info["role_id"]
+        if role_id in member["roles"]:
+            member["roles"].remove(role_id)
+            await self._member_updated(member)
+        return web.Response(status=204)
+
+    async def create_role(self, request: web.Request) -> web.Response:
+        """Create a role."""
+        body = await request.json()
+        role_id = self.guild.add_role(
+            body.get("name", "new role"), permissions=int(body.get("permissions", 0))
+        )
+        role = self.guild.roles[role_id]
+        role.update(
+            (key, body[key]) for key in ("color", "hoist", "mentionable") if key in body
+        )
+        await self.dispatch(
+            "GUILD_ROLE_CREATE", {"guild_id": str(self.guild.id), "role": role}
+        )
+        return _json(role)
+
+    async def edit_role(self, request: web.Request) -> web.Response:
+        """Edit a role."""
+        role = self.guild.roles.get(int(request.match_info["role_id"]))
+        if role is None:
+            return _not_found("Unknown Role", 10011)
+
+        role.update(await request.json())
+        await self.dispatch(
+            "GUILD_ROLE_UPDATE", {"guild_id": str(self.guild.id), "role": role}
+        )
+        return _json(role)
+
+    async def delete_role(self, request: web.Request) -> web.Response:
+        """Delete a role, taking it from every member."""
+        role_id = request.match_info["role_id"]
+        if self.guild.roles.pop(int(role_id), None) is None:
+            return _not_found("Unknown Role", 10011)
+
+        for member in self.guild.members.values():
+            if role_id in member["roles"]:
+                member["roles"].remove(role_id)
+        await self.dispatch(
+            "GUILD_ROLE_DELETE", {"guild_id": str(self.guild.id), "role_id": role_id}
+        )
+        return web.Response(status=204)
+
+    async def create_channel(self, request: web.Request) -> web.Response:
+        """Create a channel."""
+        body = await request.json()
+        channel = self.guild.add_channel(
+            body["name"],
+            type_=body.get("type", 0),
+            parent_id=body.get("parent_id"),
+            position=body.get("position"),
+        )
+        channel["permission_overwrites"] = body.get("permission_overwrites", [])
+        await self.dispatch("CHANNEL_CREATE", channel)
+        return _json(channel)
+
+    async def move_channels(self, request: web.Request) -> web.Response:
+        """Change the positions of channels."""
+        for move in await request.json():
+            channel = self.guild.channels.get(int(move["id"]))
+            if channel is None:
+                continue
+            channel.update(
+                (key, move[key]) for key in ("position", "parent_id") if key in move
+            )
+            await self.dispatch("CHANNEL_UPDATE", channel)
+        return web.Response(status=204)
+
+    async def edit_channel(self, request: web.Request) -> web.Response:
+        """Edit a channel."""
+        channel = self.guild.channels.get(int(request.match_info["channel_id"]))
+        if channel is None:
+            return _not_found("Unknown Channel", 10003)
+
+        channel.update(await request.json())
+        await self.dispatch("CHANNEL_UPDATE", channel)
+        return _json(channel)
+
+    async def delete_channel(self, request: web.Request) -> web.Response:
+        """Delete a channel."""
+        channel = self.guild.channels.pop(int(request.match_info["channel_id"]), None)
+        if channel is None:
+            return _not_found("Unknown Channel", 10003)
+
+        await self.dispatch("CHANNEL_DELETE", channel)
+        return _json(channel)
+
+    def _channel_id(self, request: web.Request) -> typing.Optional[int]:
+        """Return the ID of the channel of a request, if it exists."""
+        channel_id = int(request.match_info["channel_id"])
+        if channel_id in self.guild.channels or any(
+            int(channel["id"]) == channel_id
+            for channel in self.guild.dm_channels.values()
+        ):
+            return channel_id
+        return None
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        """Send a message as the bot."""
+        channel_id = self._channel_id(request)
+        if channel_id is None:
+            return _not_found("Unknown Channel", 10003)
+
+        body = await request.json()
+        embeds = body.get("embeds") or ([body["embed"]] if body.get("embed") else [])
+        message = self.guild.message(
+            channel_id,
+            int(self.guild.bot_user["id"]),
+            body.get("content") or "",
+            embeds=embeds,
+        )
+        await self.dispatch("MESSAGE_CREATE", message)
+        return _json(message)
+
+    async def edit_message(self, request: web.Request) -> web.Response:
+        """Edit one of the bot's messages."""
+        channel_id = self._channel_id(request)
+        if channel_id is None:
+            return _not_found("Unknown Channel", 10003)
+
+        body = await request.json()
+        message = self.guild.message(
+            channel_id,
+            int(self.guild.bot_user["id"]),
+            body.get("content") or "",
+            id=request.match_info["message_id"],
+            embeds=[body["embed"]] if body.get("embed") else [],
+        )
+        return _json(message)
+
+    # Benchmark control
+
+    async def bench_members(self, request: web.Request) -> web.Response:
+        """Return the IDs of the members, except the bot and the owner."""
+        return _json(
+            [
+                member_id
+                for member_id, member in self.guild.members.items()
+                if member["user"] not in (self.guild.bot_user, self.guild.owner)
+            ]
+        )
+
+    async def bench_message(self, request: web.Request) -> web.Response:
+        """Post a message as a member, returning its ID."""
+        body = await request.json()
+        message = self.guild.message(
+            int(body["channel_id"]), int(body["author_id"]), body["content"]
+        )
+        await self.dispatch("MESSAGE_CREATE", message)
+        return _json({"id": message["id"]})
+
+    async def bench_stats(self, request: web.Request) -> web.Response:
+        """Return the number of requests made to each route."""
+        return _json(
+            {"requests": dict(self.requests), "rate_limited": self.rate_limited}
+        )
+
+    async def bench_reset(self, request: web.Request) -> web.Response:
+        """Reset the request counts."""
+        self.requests.clear()
+        self.rate_limited = 0
+        return web.Response(status=204)
+
+
+async def serve(fake: FakeDiscord, host: str, port: int) -> None:
+    """Serve a fake Discord until cancelled, printing its port on stdout."""
+    runner = web.AppRunner(fake.app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    print(json.dumps({"port": runner.addresses[0][1]}), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    """Run a fake Discord with a synthetic guild."""
+    parser = argparse.ArgumentParser(
+        description="Serve a fake Discord API and gateway for benchmarks."
+    )
+    parser.add_argument("--config", default="config-default.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--clubs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=50.0, help="milliseconds")
+    parser.add_argument("--rate-limit", type=int, default=50)
+    parser.add_argument("--rate-limit-window", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    guild = SyntheticGuild(config, args.members, args.clubs, args.seed)
+    fake = FakeDiscord(
+        guild, args.latency / 1000, args.rate_limit, args.rate_limit_window
+    )
+    try:
+        asyncio.run(serve(fake, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
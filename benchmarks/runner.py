@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+import typing
+from pathlib import Path
+
+import aiohttp
+
+import discord
+from discord.ext import commands
+
+from roycemorebot import constants
+from roycemorebot.bot import CogLoggingBot
+from roycemorebot.metrics import peak_rss, rss
+
+log = logging.getLogger(__name__)
+
+EXTENSIONS_DIR = Path(__file__).parent.parent / "roycemorebot" / "exts"
+BENCHMARK_TOKEN = "benchmark"
+
+
+class ScenarioResult(typing.NamedTuple):
+    """The measurements of a single scenario."""
+
+    name: str
+    seconds: float
+    requests: "dict[str, int]"
+    rate_limited: int
+    errors: int
+    rss_delta: int  # bytes
+    traced_peak: typing.Optional[int]  # bytes, only when tracing allocations
+    # Of the commands the scenario timed in `Benchmark.latencies`, if any.
+    latency_p95: typing.Optional[float]  # seconds
+
+    @property
+    def total_requests(self) -> int:
+        """Return the total number of REST API requests."""
+        return sum(self.requests.values())
+
+
+def create_bot() -> commands.Bot:
+    """Create the bot and load its extensions, like `roycemorebot.__main__` does."""
+    intents = discord.Intents.default()
+    intents.typing = False
+    intents.members = True
+    bot = CogLoggingBot(
+        command_prefix=lambda bot, message: constants.Bot.prefix,
+        intents=intents,
+        chunk_guilds_at_startup=constants.Bot.chunk_guilds_at_startup,
+        cache_profile=constants.Cache.profile,
+        max_messages=constants.Cache.max_messages or None,
+        guild_ready_timeout=0.5,
+    )
+    for file in sorted(os.listdir(EXTENSIONS_DIR)):
+        if file.endswith(".py") and not file.startswith("_"):
+            bot.load_extension(f"roycemorebot.exts.{file[:-3]}")
+    return bot
+
+
+class Benchmark:
+    """
+    Run the bot against a fake Discord and measure scenarios.
+
+    The fake Discord runs in a subprocess, so only the bot's own memory and
+    CPU time are measured. Scenarios drive the bot by posting command messages
+    as members of the synthetic guild, and wait until the commands finish.
+    """
+
+    def __init__(self, options: argparse.Namespace):
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.results = []
+        self.errors = []  # (command, error)
+        self.bot = None
+        self.base_url = None
+        self.member_ids = []  # of every member, except the bot and the admin
+        self.latencies = []  # of commands timed by the current scenario, seconds
+
+        self._server = None
+        self._session = None
+        self._bot_task = None
+        self._finished = {}  # message ID -> future of the command's error
+
+    @property
+    def guild(self) -> discord.Guild:
+        """The synthetic guild."""
+        return self.bot.get_guild(constants.Guild.guild_id)
+
+    @property
+    def admin_id(self) -> int:
+        """The ID of the owner of the guild, who has every staff role."""
+        return self.guild.owner_id
+
+    async def start(self) -> None:
+        """Start the fake Discord and connect the bot to it."""
+        options = self.options
+        self._server = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "benchmarks.fake_discord",
+            f"--members={options.members}",
+            f"--clubs={options.clubs}",
+            f"--seed={options.seed}",
+            f"--latency={options.latency}",
+            f"--rate-limit={options.rate_limit}",
+            f"--rate-limit-window={options.rate_limit_window}",
+            stdout=asyncio.subprocess.PIPE,
+            env={**os.environ, "PYTHONPATH": str(Path(__file__).parent.parent)},
+        )
+        line = await self._server.stdout.readline()
+        if not line:
+            raise RuntimeError("The fake Discord exited before it started")
+        self.base_url = f"http://127.0.0.1:{json.loads(line)['port']}"
+        discord.http.Route.BASE = f"{self.base_url}/api/v7"
+        self._session = aiohttp.ClientSession()
+        # Not from the bot, whose cache may only have some of them.
+        async with self._session.get(f"{self.base_url}/_bench/members") as response:
+            self.member_ids = await response.json()
+
+        self.bot = create_bot()
+        self.bot.add_listener(self._on_command_completion, "on_command_completion")
+        self.bot.add_listener(self._on_command_error, "on_command_error")
+
+        async def connect() -> None:
+            loop = asyncio.get_event_loop()
+            self._bot_task = loop.create_task(self.bot.start(BENCHMARK_TOKEN))
+            ready = loop.create_task(self.bot.wait_until_ready())
+            await asyncio.wait(
+                (self._bot_task, ready), return_when=asyncio.FIRST_COMPLETED
+            )
+            if self._bot_task.done():
+                ready.cancel()
+                self._bot_task.result()  # Raise why the bot stopped
+
+        await self.run_scenario("startup", connect)
+
+    async def stop(self) -> None:
+        """Disconnect the bot and stop the fake Discord."""
+        if self.bot is not None:
+            await self.bot.close()
+        if self._bot_task is not None:
+            await asyncio.gather(self._bot_task, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+        if self._server is not None and self._server.returncode is None:
+            self._server.terminate()
+            await self._server.wait()
+
+    def _finish(self, message_id: int, error: typing.Optional[Exception]) -> None:
+        future = self._finished.setdefault(
+            message_id, asyncio.get_event_loop().create_future()
+        )
+        if not future.done():
+            future.set_result(error)
+
+    async def _on_command_completion(self, ctx: commands.Context) -> None:
+        self._finish(ctx.message.id, None)
+
+    async def _on_command_error(
+        self, ctx: commands.Context, error: commands.CommandError
+    ) -> None:
+        self._finish(ctx.message.id, error)
+
+    async def command(
+        self,
+        content: str,
+        author_id: typing.Optional[int] = None,
+        channel_id: typing.Optional[int] = None,
+    ) -> float:
+        """Post a command as a member, returning how long the bot took to run it."""
+        start = time.perf_counter()
+        author_id = author_id or self.admin_id
+        channel_id = channel_id or constants.Channels.roycemorebot_commands
+        async with self._session.post(
+            f"{self.base_url}/_bench/messages",
+            json={
+                "channel_id": channel_id,
+                "author_id": author_id,
+                "content": constants.Bot.prefix + content,
+            },
+        ) as response:
+            message_id = int((await response.json())["id"])
+
+        future = self._finished.setdefault(
+            message_id, asyncio.get_event_loop().create_future()
+        )
+        try:
+            error = await asyncio.wait_for(future, timeout=self.options.timeout)
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"No response after {self.options.timeout}s")
+        finally:
+            del self._finished[message_id]
+
+        if error is not None:
+            log.warning(f"`{content}` failed: {error!r}")
+            self.errors.append((content, error))
+        return time.perf_counter() - start
+
+    async def _server_stats(self) -> dict:
+        async with self._session.get(f"{self.base_url}/_bench/stats") as response:
+            return await response.json()
+
+    async def _reset_server_stats(self) -> None:
+        async with self._session.post(f"{self.base_url}/_bench/reset"):
+            pass
+
+    async def run_scenario(
+        self, name: str, scenario: typing.Callable[[], typing.Awaitable[None]]
+    ) -> ScenarioResult:
+        """Run a scenario, measuring it."""
+        await self._reset_server_stats()
+        errors = len(self.errors)
+        self.latencies = []
+        rss_before = rss()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        await scenario()
+        seconds = time.perf_counter() - start
+
+        traced_peak = (
+            tracemalloc.get_traced_memory()[1] - traced
+            if tracemalloc.is_tracing()
+            else None
+        )
+        stats = await self._server_stats()
+        result = ScenarioResult(
+            name,
+            seconds,
+            stats["requests"],
+            stats["rate_limited"],
+            len(self.errors) - errors,
+            rss() - rss_before,
+            traced_peak,
+            _percentile(self.latencies, 95),
+        )
+        self.results.append(result)
+        return result
+
+
+def _percentile(values: "list[float]", percent: float) -> typing.Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def _format_bytes(size: typing.Optional[int], sign: bool = True) -> str:
+    if size is None:
+        return "-"
+    return f"{size / 1024 / 1024:{'+' if sign else ''}.1f} MiB"
+
+
+def format_report(results: "list[ScenarioResult]", routes: bool = False) -> str:
+    """Format the results of the scenarios as a table."""
+    lines = [
+        f"{'scenario':<16}{'wall time':>12}{'requests':>10}{'429s':>6}{'errors':>8}"
+        + f"{'RSS':>12}{'traced peak':>14}{'p95 latency':>13}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.name:<16}{result.seconds:>11.3f}s{result.total_requests:>10}"
+            + f"{result.rate_limited:>6}{result.errors:>8}"
+            + f"{_format_bytes(result.rss_delta):>12}"
+            + f"{_format_bytes(result.traced_peak):>14}"
+            + (
+                f"{result.latency_p95:>12.3f}s"
+                if result.latency_p95 is not None
+                else f"{'-':>13}"
+            )
+        )
+        if routes:
+            for route, count in sorted(
+                result.requests.items(), key=lambda item: -item[1]
+            ):
+                lines.append(f"    {count:>6}  {route}")
+    lines.append(f"Peak RSS: {_format_bytes(peak_rss(), sign=False)}")
+    return "\n".join(lines)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import typing
+
+from roycemorebot.constants import Channels
+
+if typing.TYPE_CHECKING:
+    from benchmarks.runner import Benchmark
+
+log = logging.getLogger(__name__)
+
+SUBSCRIBERS = 200  # members subscribing at once in the subscriptions scenario
+SUBSCRIPTIONS_PER_MEMBER = 8  # announcement roles named in each command
+CLUBS_ADDED = 3
+LEADERS_PER_CLUB = 2
+ROLLOVER_SUBSCRIBERS = 20  # members subscribing one after another during new-grade
+ROLLOVER_START_SHARE = 0.1  # share of new-grade done before members subscribe
+ROLLOVER_POLL_INTERVAL = 0.01  # seconds between checks of new-grade's progress
+
+
+def _typo(name: str, random: typing.Any) -> str:
+    """Swap two neighbouring letters of a name, like a hurried typist."""
+    if len(name) < 4:
+        return name
+    i = random.randrange(1, len(name) - 2)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2 :]
+
+
+async def subscriptions(bench: "Benchmark") -> None:
+    """Have many members subscribe to, then unsubscribe from, announcement roles."""
+    names = list(bench.bot.get_cog("Subscriptions").announcement_roles)
+    member_ids = bench.random.sample(
+        bench.member_ids, min(SUBSCRIBERS, len(bench.member_ids))
+    )
+    picks = [
+        (
+            member_id,
+            " ".join(
+                _typo(name, bench.random)
+                for name in bench.random.sample(
+                    names, min(SUBSCRIPTIONS_PER_MEMBER, len(names))
+                )
+            ),
+        )
+        for member_id in member_ids
+    ]
+
+    await asyncio.gather(
+        *(bench.command(f"subscribe {name}", author) for author, name in picks)
+    )
+    await asyncio.gather(
+        *(bench.command(f"unsubscribe {name}", author) for author, name in picks)
+    )
+
+
+async def clubs(bench: "Benchmark") -> None:
+    """Add clubs with leaders, then remove them again."""
+    names = [f"bench-club-{number}" for number in range(CLUBS_ADDED)]
+    for name in names:
+        leader_ids = bench.random.sample(bench.member_ids, LEADERS_PER_CLUB)
+        mentions = " ".join(f"<@{leader_id}>" for leader_id in leader_ids)
+        await bench.command(
+            f"subscriptions add-club {name} {mentions}",
+            channel_id=Channels.mod_bot_commands,
+        )
+
+    for name in names:
+        channel = next(
+            channel for channel in bench.guild.text_channels if channel.name == name
+        )
+        await bench.command(
+            f"subscriptions remove-club {channel.mention}",
+            channel_id=Channels.mod_bot_commands,
+        )
+
+
+async def new_grade(bench: "Benchmark") -> None:
+    """Move everyone's class role up one grade."""
+    await bench.command("new-grade", channel_id=Channels.mod_bot_commands)
+
+
+async def rollover(bench: "Benchmark") -> None:
+    """Time members subscribing while everyone's class role is moved up a grade."""
+    job = asyncio.get_event_loop().create_task(new_grade(bench))
+    # Wait for the job to be underway, however long that takes at this size.
+    class_roles = bench.bot.get_cog("Class Roles")
+    while not job.done():
+        bulk_job = class_roles.new_grade_job
+        if bulk_job and bulk_job.done >= ROLLOVER_START_SHARE * bulk_job.total:
+            break
+        await asyncio.sleep(ROLLOVER_POLL_INTERVAL)
+
+    names = list(bench.bot.get_cog("Subscriptions").announcement_roles)
+    for member_id in bench.random.sample(bench.member_ids, ROLLOVER_SUBSCRIBERS):
+        if job.done():
+            break
+        name = bench.random.choice(names)
+        bench.latencies.append(await bench.command(f"subscribe {name}", member_id))
+    await job
+
+    if not bench.latencies:
+        log.warning("new-grade finished before any member subscribed")
+
+
+# In the order they run by default.
+SCENARIOS = {
+    "subscriptions": subscriptions,
+    "clubs": clubs,
+    "new-grade": new_grade,
+    "rollover": rollover,
+}
@@ -0,0 +1,305 @@
+import itertools
+import random
+import re
+import typing
+from datetime import datetime, timezone
+
+CLUB_NAMES = (
+    "chess",
+    "robotics",
+    "drama",
+    "debate",
+    "model-un",
+    "art",
+    "science-olympiad",
+    "math",
+    "coding",
+    "film",
+    "book",
+    "music",
+    "gardening",
+    "esports",
+    "photography",
+    "quiz-bowl",
+    "environmental",
+    "cooking",
+    "writing",
+    "astronomy",
+)
+
+CLASS_ROLE_NAMES = {
+    "grade_5": "5th Graders",
+    "grade_6": "6th Graders",
+    "grade_7": "7th Graders",
+    "grade_8": "8th Graders",
+    "freshmen": "Freshmen",
+    "sophomores": "Sophomores",
+    "juniors": "Juniors",
+    "seniors": "Seniors",
+    "alumni": "Alumni",
+}
+
+ADMINISTRATOR = 1 << 3
+TEXT_CHANNEL = 0
+DM_CHANNEL = 1
+CATEGORY_CHANNEL = 4
+
+MENTION = re.compile(r"<@!?([0-9]+)>")
+
+# Generated IDs start after every ID in the config, so they never clash.
+_FIRST_ID = (
+    int(datetime(2022, 1, 1, tzinfo=timezone.utc).timestamp() * 1000) - 1420070400000
+) << 22
+
+
+def _timestamp() -> str:
+    """Return the current time in the format Discord uses."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SyntheticGuild:
+    """
+    A generated guild, stored as the JSON payloads Discord would send.
+
+    The guild, staff roles, class roles, pronoun roles and channels use the IDs
+    from the bot's config, so the real cogs work against it unchanged. Members
+    get a random class role (or none), pronoun roles and announcement roles.
+    """
+
+    def __init__(self, config: dict, members: int, clubs: int, seed: int = 0):
+        self._ids = itertools.count(_FIRST_ID)
+        self._random = random.Random(seed)
+        guild_config = config["guild"]
+
+        self.id = guild_config["guild_id"]
+        self.roles = {}  # ID -> role payload
+        self.channels = {}  # ID -> channel payload
+        self.members = {}  # ID -> member payload
+        self.dm_channels = {}  # recipient ID -> channel payload
+
+        self.bot_user = self.user("Roycemore Bot", bot=True)
+        self.owner = self.user("Benchmark Admin")
+
+        self.add_role("@everyone", id_=self.id, position=0)
+        bot_role = self.add_role("Roycemore Bot", permissions=ADMINISTRATOR)
+        staff_roles = {}
+        for name, role_id in guild_config["staff_roles"].items():
+            staff_roles[name] = self.add_role(name.replace("_", " ").title(), role_id)
+        class_roles = [
+            self.add_role(CLASS_ROLE_NAMES[name], role_id)
+            for name, role_id in guild_config["class_roles"].items()
+        ]
+        pronoun_roles = [
+            self.add_role(name.replace("_", "/").title(), role_id)
+            for name, role_id in guild_config["pronoun_roles"].items()
+        ]
+        announcement_roles = [
+            self.add_role("Server Announcements"),
+            self.add_role("Event Announcements"),
+        ]
+
+        clubs_category = guild_config["categories"]["clubs"]
+        self.add_channel("Clubs", id_=clubs_category, type_=CATEGORY_CHANNEL)
+        for name, channel_id in guild_config["channels"].items():
+            self.add_channel(name.replace("_", "-"), id_=channel_id)
+        for number, name in enumerate(self.club_names(clubs)):
+            self.add_role(f"{name.title()} Club Leader")
+            announcement_roles.append(
+                self.add_role(f"{name.title()} Club Announcements")
+            )
+            self.add_channel(name, parent_id=clubs_category, position=number)
+
+        self.add_member(self.bot_user, [bot_role])
+        self.add_member(
+            self.owner,
+            [
+                staff_roles["admin_role"],
+                staff_roles["mod_role"],
+                staff_roles["bot_team_role"],
+            ],
+        )
+        for number in range(members):
+            roles = []
+            if self._random.random() < 0.95:
+                roles.append(self._random.choice(class_roles))
+            if self._random.random() < 0.5:
+                roles.append(self._random.choice(pronoun_roles))
+            roles += self._random.sample(announcement_roles, self._random.randint(0, 3))
+            self.add_member(self.user(f"member{number}"), roles)
+
+    @staticmethod
+    def club_names(count: int) -> "list[str]":
+        """Return `count` distinct club channel names."""
+        names = []
+        for number in itertools.count(1):
+            for name in CLUB_NAMES:
+                if len(names) == count:
+                    return names
+                names.append(name if number == 1 else f"{name}{number}")
+        return names
+
+    def next_id(self) -> int:
+        """Return a new, unused ID."""
+        return next(self._ids)
+
+    def user(self, username: str, bot: bool = False) -> dict:
+        """Create a user payload."""
+        return {
+            "id": str(self.next_id()),
+            "username": username,
+            "discriminator": f"{self._random.randint(1, 9999):04}",
+            "avatar": None,
+            "bot": bot,
+        }
+
+    def add_role(
+        self,
+        name: str,
+        id_: typing.Optional[int] = None,
+        permissions: int = 0,
+        position: typing.Optional[int] = None,
+    ) -> int:
+        """Add a role to the guild, returning its ID."""
+        role_id = id_ if id_ is not None else self.next_id()
+        self.roles[role_id] = {
+            "id": str(role_id),
+            "name": name,
+            "permissions": str(permissions),
+            "position": len(self.roles) if position is None else position,
+            "color": 0,
+            "hoist": False,
+            "managed": False,
+            "mentionable": True,
+        }
+        return role_id
+
+    def add_channel(
+        self,
+        name: str,
+        id_: typing.Optional[int] = None,
+        type_: int = TEXT_CHANNEL,
+        parent_id: typing.Optional[int] = None,
+        position: typing.Optional[int] = None,
+    ) -> dict:
+        """Add a channel to the guild."""
+        channel_id = id_ if id_ is not None else self.next_id()
+        channel = {
+            "id": str(channel_id),
+            "type": type_,
+            "guild_id": str(self.id),
+            "name": name,
+            "position": len(self.channels) if position is None else position,
+            "parent_id": str(parent_id) if parent_id is not None else None,
+            "permission_overwrites": [],
+            "topic": None,
+            "nsfw": False,
+            "last_message_id": None,
+            "rate_limit_per_user": 0,
+        }
+        self.channels[channel_id] = channel
+        return channel
+
+    def add_member(self, user: dict, roles: "list[int]") -> dict:
+        """Add a member to the guild."""
+        member = {
+            "user": user,
+            "roles": [str(role_id) for role_id in roles],
+            "nick": None,
+            "joined_at": _timestamp(),
+            "premium_since": None,
+            "deaf": False,
+            "mute": False,
+            "pending": False,
+        }
+        self.members[int(user["id"])] = member
+        return member
+
+    @property
+    def bot_member(self) -> dict:
+        """Return the bot's member payload."""
+        return self.members[int(self.bot_user["id"])]
+
+    def dm_channel(self, recipient_id: int) -> dict:
+        """Get the DM channel with a user, creating it if needed."""
+        if recipient_id not in self.dm_channels:
+            self.dm_channels[recipient_id] = {
+                "id": str(self.next_id()),
+                "type": DM_CHANNEL,
+                "recipients": [self.members[recipient_id]["user"]],
+                "last_message_id": None,
+            }
+        return self.dm_channels[recipient_id]
+
+    def message(self, channel_id: int, author_id: int, content: str, **fields) -> dict:
+        """Create a message payload."""
+        message = {
+            "id": str(self.next_id()),
+            "channel_id": str(channel_id),
+            "author": self.members[author_id]["user"],
+            "content": content,
+            "timestamp": _timestamp(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [
+                self._mention(int(member_id)) for member_id in MENTION.findall(content)
+            ],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "reactions": [],
+            "pinned": False,
+            "type": 0,
+            **fields,
+        }
+        if channel_id in self.channels:
+            message["guild_id"] = str(self.id)
+            message["member"] = self._partial_member(author_id)
+        return message
+
+    def _partial_member(self, member_id: int) -> dict:
+        """Return a member payload without the user, like in messages."""
+        member = self.members[member_id]
+        return {key: member[key] for key in member if key != "user"}
+
+    def _mention(self, member_id: int) -> dict:
+        """Return the payload of a mentioned member."""
+        return {
+            **self.members[member_id]["user"],
+            "member": self._partial_member(member_id),
+        }
+
+    def payload(self, members: bool = True) -> dict:
+        """
+        Return the payload of the guild, like in a `GUILD_CREATE` event.
+
+        Like Discord does for large guilds, only the bot's member is included
+        unless `members` is true, and the rest must be requested in chunks.
+        """
+        return {
+            "id": str(self.id),
+            "name": "Synthetic Roycemore",
+            "icon": None,
+            "splash": None,
+            "owner_id": self.owner["id"],
+            "region": "us-central",
+            "afk_channel_id": None,
+            "afk_timeout": 300,
+            "verification_level": 0,
+            "default_message_notifications": 0,
+            "explicit_content_filter": 0,
+            "roles": list(self.roles.values()),
+            "emojis": [],
+            "features": [],
+            "mfa_level": 0,
+            "system_channel_id": None,
+            "joined_at": _timestamp(),
+            "large": len(self.members) > 250,
+            "unavailable": False,
+            "member_count": len(self.members),
+            "voice_states": [],
+            "members": list(self.members.values()) if members else [self.bot_member],
+            "channels": list(self.channels.values()),
+            "presences": [],
+            "premium_tier": 0,
+        }
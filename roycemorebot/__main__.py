@@ -1,29 +1,20 @@
 import logging
 import os
-import subprocess
 from datetime import datetime
 
 import discord
 from discord.ext import commands
 
-from roycemorebot import constants
+from roycemorebot import constants, deploy
+from roycemorebot.bot import CogLoggingBot
+from roycemorebot.checks import has_any_role_in
 
 log = logging.getLogger("roycemorebot.main")
 
 
-# Change the bot class to log adding/removing cogs:
-class CogLoggingBot(commands.Bot):
-    """Subclass of `discord.ext.commands.Bot` to log adding and removing cogs."""
-
-    def add_cog(self, cog) -> None:  # noqa: ANN001
-        """Add a cog and log it."""
-        super().add_cog(cog)
-        log.info(f"Cog loaded: {cog.qualified_name}")
-
-    def remove_cog(self, name) -> None:  # noqa: ANN001
-        """Remove a cog and log it."""
-        super().remove_cog(name)
-        log.info(f"Cog unloaded: {name}")
+def get_prefix(bot: commands.Bot, message: discord.Message) -> str:
+    """Get the command prefix, which can change when the config is reloaded."""
+    return constants.Bot.prefix
 
 
 # Create bot
@@ -31,8 +22,11 @@ def remove_cog(self, name) -> None:  # noqa: ANN001
 intents.typing = False
 intents.members = True
 bot = CogLoggingBot(
-    command_prefix=constants.Bot.prefix,
+    command_prefix=get_prefix,
     intents=intents,
+    chunk_guilds_at_startup=constants.Bot.chunk_guilds_at_startup,
+    cache_profile=constants.Cache.profile,
+    max_messages=constants.Cache.max_messages or None,
     activity=discord.Activity(
         type=discord.ActivityType.watching, name=f"{constants.Bot.prefix}help"
     ),
@@ -46,7 +40,7 @@ async def on_ready() -> None:
     """Message that the bot is ready."""
     log.info(f"Logged in as {bot.user}")
 
-    log.trace(f"Time: {datetime.now()}")
+    log.trace("Time: %s", datetime.now())
     channel = bot.get_channel(constants.Channels.bot_log)
     embed = discord.Embed(
         description="Connected!",
@@ -68,10 +62,10 @@ async def on_ready() -> None:
 
 # Log if debug mode is on
 log.info(f"Debug: {constants.DEBUG_MODE}")
-log.trace(f"Debug env variable: {os.environ['DEBUG']}")
+log.trace("Debug env variable: %s", os.environ["DEBUG"])
 
 
-@commands.has_any_role(*constants.BOT_ADMINS)
+@has_any_role_in(constants.BOT_ADMINS)
 @bot.command(aliases=("r",))
 async def reload(ctx: commands.Context, cog: str) -> None:
     """Reload a cog."""
@@ -85,38 +79,45 @@ async def reload(ctx: commands.Context, cog: str) -> None:
         await ctx.send(f"Cog `{cog}` successfully reloaded!")
 
 
-@commands.has_any_role(*constants.BOT_ADMINS)
+@has_any_role_in(constants.BOT_ADMINS)
 @bot.command(name="git-pull", aliases=("gitpull", "gp"))
 async def git_pull(ctx: commands.Context) -> None:
-    """Pull new changes."""
+    """Pull new changes, reloading changed cogs or restarting if needed."""
     log.info(f"{ctx.author} ran a git pull")
+    output = deploy.OutputMessage(
+        await ctx.send("Running `git pull`..."), "Running `git pull`..."
+    )
     try:
-        c = subprocess.run(
-            ["git", "pull"],
-            capture_output=True,
-            check=True,
-            encoding="utf-8",
-            timeout=60,
-        )
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError, OSError) as e:
+        changes = await deploy.pull(on_output=output.write)
+    except (deploy.GitError, OSError) as e:
         log.info(f"Command error! `{str(e)}`")
-        await ctx.send(
+        log.trace("Output: %s", getattr(e, "output", None))
+        await output.flush(
             f"{constants.Emoji.warning} There was an error trying to execute that "
-            + f"command:\n```\n{str(e)}\n```"
+            + f"command: {e}"
         )
-
-        # Print output if available
-        log.trace(f"Output: {e.stderr}")
-        if (
-            isinstance(e, (subprocess.TimeoutExpired, subprocess.SubprocessError))
-            and e.stderr
-        ):
-            await ctx.send(f"Command output:\n```\n{e.stderr}\n```")
-    else:
-        # Command worked
-        await ctx.send(f"{constants.Emoji.green_check} Command executed successfully.")
-        if c.stdout:
-            await ctx.send(f"Command output:\n```\n{c.stdout}\n```")
+        return
+
+    await output.flush(f"{constants.Emoji.green_check} Command executed successfully.")
+    deploy_plan = deploy.plan(changes, bot.extensions)
+    if deploy_plan.empty:
+        await ctx.send("No cogs changed, nothing to reload.")
+        return
+    if deploy_plan.restart:
+        log.info(f"Restarting to deploy changes to {', '.join(deploy_plan.restart)}")
+        await ctx.send(
+            f"{constants.Emoji.warning} Core modules changed "
+            + f"({', '.join(deploy_plan.restart)}), restarting."
+        )
+        await bot.logout()  # restarted by PM2
+        return
+
+    errors = deploy.apply(bot, deploy_plan)
+    deployed = deploy_plan.load + deploy_plan.reload + deploy_plan.unload
+    message = f"{constants.Emoji.ok} Deployed {', '.join(f'`{e}`' for e in deployed)}."
+    if errors:
+        message += "\n" + "\n".join(errors)
+    await ctx.send(message[:2000])
 
 
 bot.run(constants.Bot.bot_token)
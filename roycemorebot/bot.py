@@ -0,0 +1,96 @@
+import logging
+import time
+import typing
+
+import discord
+from discord.ext import commands
+
+from roycemorebot import infractions, members, metrics, persistence, priorities
+from roycemorebot.constants import Health
+from roycemorebot.deletions import DeletionScheduler
+from roycemorebot.health import HealthServer
+
+log = logging.getLogger(__name__)
+
+CACHE_PROFILES = ("full", "compact")
+
+
+# Change the bot class to log adding/removing cogs:
+class CogLoggingBot(commands.Bot):
+    """
+    Subclass of `discord.ext.commands.Bot` to log adding and removing cogs.
+
+    `cache_profile` is either "full", to cache every member like discord.py
+    does by default, or "compact", to only cache the bot's own member and keep
+    the roles of the other members in the member store instead.
+    """
+
+    def __init__(self, *args, cache_profile: str = "full", **kwargs):
+        if cache_profile not in CACHE_PROFILES:
+            raise ValueError(f"Unknown cache profile `{cache_profile}`")
+        if cache_profile == "compact":
+            kwargs.setdefault("member_cache_flags", discord.MemberCacheFlags.none())
+
+        super().__init__(*args, **kwargs)
+        self.cache_profile = cache_profile
+        self.deletions = DeletionScheduler(self)
+        self.health = HealthServer(self)
+        priorities.install(self.http)
+        metrics.install_rate_limit_handler()
+        members.install(self, compact=cache_profile == "compact")
+
+    def add_cog(self, cog) -> None:  # noqa: ANN001
+        """Add a cog and log it."""
+        super().add_cog(cog)
+        log.info(f"Cog loaded: {cog.qualified_name}")
+
+    def remove_cog(self, name) -> None:  # noqa: ANN001
+        """Remove a cog and log it."""
+        super().remove_cog(name)
+        log.info(f"Cog unloaded: {name}")
+
+    async def invoke(self, ctx: commands.Context) -> None:
+        """Invoke a command, recording how long it took and whether it failed."""
+        if ctx.command is None:
+            await super().invoke(ctx)
+            return
+
+        start = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            metrics.observe_command(
+                ctx.command.qualified_name,
+                time.perf_counter() - start,
+                ctx.command_failed,
+            )
+
+    async def _run_event(
+        self, coro: typing.Callable, event_name: str, *args, **kwargs
+    ) -> None:
+        """Run an event listener, recording how long it took."""
+        # `_run_event` is private to discord.py 1.7, but it is the only place
+        # every listener, including those of cogs, is awaited.
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            metrics.observe_listener(
+                getattr(coro, "__qualname__", event_name), time.perf_counter() - start
+            )
+
+    async def start(self, *args, **kwargs) -> None:
+        """Start the bot's background services, then the bot itself."""
+        self.deletions.start()
+        # Serve health checks and metrics locally, for monitoring
+        if Health.enabled:
+            await self.health.start()
+        await super().start(*args, **kwargs)
+
+    async def close(self) -> None:
+        """Save any pending data, then close the bot."""
+        await self.deletions.stop()
+        await self.health.stop()
+        await persistence.flush_all()
+        await infractions.store.close()
+        await super().close()
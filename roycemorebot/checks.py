@@ -1,17 +1,80 @@
-from typing import Union
+import typing
 
-from discord.ext.commands import Context, has_any_role
-from discord.ext.commands.errors import CheckFailure
+import discord
+from discord.ext.commands import Context, check
+from discord.ext.commands.errors import MissingAnyRole, NoPrivateMessage
 
 
-async def has_any_role_check(ctx: Context, *roles: Union[str, int]) -> bool:
+class RoleMasks:
+    """
+    Bitmasks of roles, for checking which roles a member has with a single AND.
+
+    Every role that is checked for gets a bit, and groups of roles like
+    `constants.MOD_ROLES` are compiled into masks once. A member's mask is
+    built from their role IDs with a dict lookup each, so a check doesn't look
+    up or sort the member's roles like `commands.has_any_role`.
+    """
+
+    def __init__(self):
+        self._bits = {}  # role ID -> bit
+        self._groups = {}  # tuple of role IDs -> mask
+
+    def group_mask(self, roles: typing.Iterable[int]) -> int:
+        """Return the mask of a group of roles, giving new roles a bit."""
+        key = tuple(roles)
+        mask = self._groups.get(key)
+        if mask is None:
+            mask = 0
+            for role_id in key:
+                if role_id not in self._bits:
+                    self._bits[role_id] = 1 << len(self._bits)
+                mask |= self._bits[role_id]
+            self._groups[key] = mask
+        return mask
+
+    def member_mask(self, member: discord.Member) -> int:
+        """Return the mask of the checked roles a member has."""
+        # Not cached: discord.py builds a new member for every message, so a
+        # cache would never hit. `member.roles` would look up and sort every role.
+        bits = self._bits
+        mask = 0
+        for role_id in member._roles:
+            mask |= bits.get(role_id, 0)
+        return mask
+
+    def has_any(self, member: discord.Member, roles: typing.Iterable[int]) -> bool:
+        """Return whether a member has any of the roles."""
+        return bool(self.group_mask(roles) & self.member_mask(member))
+
+
+role_masks = RoleMasks()
+
+
+async def has_any_role_check(ctx: Context, *roles: int) -> bool:
     """Check if a user has any of the passed roles."""
-    try:
-        return await has_any_role(*roles).predicate(ctx)
-    except CheckFailure:
+    if not isinstance(ctx.author, discord.Member):
         return False
+    return role_masks.has_any(ctx.author, roles)
 
 
-async def has_no_roles_check(ctx: Context, *roles: Union[str, int]) -> bool:
+async def has_no_roles_check(ctx: Context, *roles: int) -> bool:
     """Check if a user has none of the passed roles."""
     return not await has_any_role_check(ctx, *roles)
+
+
+def has_any_role_in(roles: typing.Sequence[int]) -> typing.Callable:
+    """
+    Command check that the invoker has any of the roles in a sequence.
+
+    Unlike `commands.has_any_role`, the roles are read when the command is run,
+    so groups of roles like `constants.MOD_ROLES` can change after a config reload.
+    """
+
+    async def predicate(ctx: Context) -> bool:
+        if ctx.guild is None:
+            raise NoPrivateMessage()
+        if not await has_any_role_check(ctx, *roles):
+            raise MissingAnyRole(list(roles))
+        return True
+
+    return check(predicate)
@@ -0,0 +1,102 @@
+import logging
+import typing
+
+import discord
+
+if typing.TYPE_CHECKING:
+    from roycemorebot.members import MemberRecord
+
+log = logging.getLogger(__name__)
+
+
+class ClassRoleIndex:
+    """
+    An index of which members of a guild have which class roles.
+
+    The index is built once from the member cache, or the member store with the
+    compact cache profile, and then kept up to date from
+    member events, so that questions like "who are the seniors?" or "who has no
+    class role?" can be answered without scanning every member of the guild.
+    """
+
+    def __init__(self, role_ids: typing.Iterable[int]):
+        self.role_ids = list(role_ids)
+        self._members = {role_id: set() for role_id in self.role_ids}
+        self._member_roles = {}  # member ID -> class role IDs of that member
+        self._unassigned = set()  # IDs of non-bot members with no class role
+
+    def __len__(self) -> int:
+        return len(self._member_roles)
+
+    def _clear(self) -> None:
+        for members_with_role in self._members.values():
+            members_with_role.clear()
+        self._member_roles.clear()
+        self._unassigned.clear()
+
+    def build(self, members: typing.Iterable[discord.Member]) -> None:
+        """Rebuild the index from scratch."""
+        self._clear()
+        for member in members:
+            self.update(member)
+
+        log.info(f"Built class role index of {len(self)} members")
+
+    def build_from_records(self, records: "dict[int, MemberRecord]") -> None:
+        """Rebuild the index from scratch from member store records."""
+        self._clear()
+        for member_id, record in records.items():
+            self.update_roles(member_id, record.role_ids, record.bot)
+
+        log.info(f"Built class role index of {len(self)} stored members")
+
+    def update(self, member: discord.Member) -> None:
+        """Add a member to the index, or update their entry."""
+        self.update_roles(member.id, (role.id for role in member.roles), member.bot)
+
+    def update_roles(
+        self, member_id: int, role_ids: typing.Iterable[int], bot: bool = False
+    ) -> None:
+        """Add a member to the index by their role IDs, or update their entry."""
+        class_roles = frozenset(
+            role_id for role_id in role_ids if role_id in self._members
+        )
+        old_class_roles = self._member_roles.get(member_id, frozenset())
+        self._member_roles[member_id] = class_roles
+
+        if class_roles != old_class_roles:
+            for role_id in old_class_roles - class_roles:
+                self._members[role_id].discard(member_id)
+            for role_id in class_roles - old_class_roles:
+                self._members[role_id].add(member_id)
+
+        if class_roles or bot:
+            self._unassigned.discard(member_id)
+        else:
+            self._unassigned.add(member_id)
+
+    def remove(self, member_id: int) -> None:
+        """Remove a member from the index."""
+        for role_id in self._member_roles.pop(member_id, frozenset()):
+            self._members[role_id].discard(member_id)
+        self._unassigned.discard(member_id)
+
+    def members_with(self, role_id: int) -> "set[int]":
+        """Return the IDs of all members with a class role."""
+        return self._members[role_id]
+
+    def class_roles_of(self, member_id: int) -> "frozenset[int]":
+        """Return the class role IDs of a member."""
+        return self._member_roles.get(member_id, frozenset())
+
+    def counts(self) -> "dict[int, int]":
+        """Return the number of members with each class role."""
+        return {
+            role_id: len(members_with_role)
+            for role_id, members_with_role in self._members.items()
+        }
+
+    @property
+    def unassigned(self) -> "set[int]":
+        """Return the IDs of all non-bot members without a class role."""
+        return self._unassigned
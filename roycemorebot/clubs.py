@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import typing
+
+import discord
+
+from roycemorebot.constants import Categories, StaffRoles
+from roycemorebot.priorities import BACKGROUND, priority
+from roycemorebot.roles import RoleTransaction
+
+log = logging.getLogger(__name__)
+
+REASON = "Club creation"
+
+
+async def _gather(*aws: typing.Awaitable) -> list:
+    """
+    Run awaitables concurrently, raising the first error once all of them finish.
+
+    Unlike a plain `asyncio.gather`, nothing is still running when an error is
+    raised, so everything that was created can be rolled back.
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def _club_position(
+    category: discord.CategoryChannel, name: str
+) -> typing.Optional[int]:
+    """
+    Return the position to create a club channel at to keep its category sorted.
+
+    Channels are sorted by position and then by ID, so a new channel with the
+    same position as the channel before it alphabetically ends up right after
+    it. Returns `None` if there's no free position before the first channel.
+    """
+    channels = sorted(category.text_channels, key=lambda channel: channel.position)
+    before = [channel for channel in channels if channel.name < name]
+    if before:
+        return max(channel.position for channel in before)
+    if not channels:
+        return 0
+    if channels[0].position > 0:
+        return channels[0].position - 1
+    return None
+
+
+class ClubProvisioning:
+    """
+    Create the roles and channel of a new club, rolling back if any step fails.
+
+    Steps that don't depend on each other run concurrently: both roles are
+    created at once, and then the channel is created while the leaders are
+    given their role. The channel is created at its sorted position, so it
+    doesn't need moving afterwards. If any step fails, everything created so
+    far is deleted again and the error is raised.
+    """
+
+    def __init__(
+        self,
+        guild: discord.Guild,
+        name: str,
+        leaders: "typing.Sequence[discord.Member]",
+        club: bool,
+        leader_title: str,
+    ):
+        self.guild = guild
+        self.name = name
+        self.leaders = leaders
+        self.club = club
+        self.leader_title = leader_title
+
+        self.leader_role = None
+        self.announcement_role = None
+        self.channel = None
+        self._created = []  # roles and channels, in the order they were created
+
+    @property
+    def _role_prefix(self) -> str:
+        return f"{self.name.title()}{' Club' if self.club else ''}"
+
+    async def run(self) -> None:
+        """Create everything for the club, or nothing if a step fails."""
+        # Members' role commands go first, this isn't in a hurry.
+        with priority(BACKGROUND):
+            try:
+                self.leader_role, self.announcement_role = await _gather(
+                    self._create_role(f"{self._role_prefix} {self.leader_title}"),
+                    self._create_role(f"{self._role_prefix} Announcements"),
+                )
+                log.trace(
+                    "Created %s and %s role", self.leader_role, self.announcement_role
+                )
+
+                await _gather(self._create_channel(), self._assign_leaders())
+            except Exception:
+                log.warning(f"Creating club `{self.name}` failed, rolling back")
+                await self.rollback()
+                raise
+
+    async def _create_role(self, name: str) -> discord.Role:
+        role = await self.guild.create_role(name=name, mentionable=True, reason=REASON)
+        self._created.append(role)
+        return role
+
+    async def _assign_leaders(self) -> None:
+        await _gather(
+            *(
+                RoleTransaction(leader).add(self.leader_role).commit(reason=REASON)
+                for leader in self.leaders
+            )
+        )
+        log.trace("Assigned leaders their roles")
+
+    async def _create_channel(self) -> None:
+        guild = self.guild
+        clubs_category = discord.utils.get(guild.categories, id=Categories.clubs)
+        position = _club_position(clubs_category, self.name)
+        self.channel = await clubs_category.create_text_channel(
+            self.name,
+            position=position,
+            overwrites={
+                guild.get_role(StaffRoles.mod_role): discord.PermissionOverwrite(
+                    view_channel=True, send_messages=True
+                ),
+                guild.get_role(StaffRoles.muted_role): discord.PermissionOverwrite(
+                    send_messages=False
+                ),
+                self.leader_role: discord.PermissionOverwrite(
+                    view_channel=True,
+                    manage_channels=True,
+                    manage_permissions=True,
+                    send_messages=True,
+                    manage_messages=True,
+                ),
+            },
+            reason=REASON,
+        )
+        self._created.append(self.channel)
+
+        if position is None:  # Has to go first, but nothing can go before the top
+            await self.channel.edit(position=0, reason=REASON)
+        log.trace("Created channel %s at position %s", self.channel, position)
+
+    async def rollback(self) -> None:
+        """Delete everything that was created, newest first."""
+        for created in reversed(self._created):
+            try:
+                await created.delete(reason="Rolling back club creation")
+            except discord.HTTPException as e:
+                log.error(f"Could not delete {created} while rolling back: {e}")
+            else:
+                log.trace("Deleted %s", created)
+        self._created.clear()
@@ -1,18 +1,55 @@
 import json
 import logging
 import os
+import typing
 from distutils.util import strtobool
 from pathlib import Path
 
 log = logging.getLogger(__name__)
 
-if Path("config.json").exists():
-    log.info("Found `config.json`, loading constants from it.")
-    with open("config.json", "r") as f:
-        _CONFIG_JSON = json.load(f)
-else:
+
+def _merge(base: dict, override: dict) -> dict:
+    """Recursively merge `override` into `base`, returning `base`."""
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def _load_config() -> dict:
+    """Load `config-default.json`, overridden by `config.json` if it exists."""
     with open("config-default.json", "r") as f:
-        _CONFIG_JSON = json.load(f)
+        config = json.load(f)
+
+    if Path("config.json").exists():
+        log.info("Found `config.json`, loading constants from it.")
+        with open("config.json", "r") as f:
+            _merge(config, json.load(f))
+
+    return config
+
+
+_CONFIG_JSON = _load_config()
+_CONFIG_ERRORS = []  # Missing or invalid configuration variables found at import
+_CONFIG_CLASSES = []  # Every configuration class, for reloading
+
+
+def _coerce(item: typing.Any, type_: type) -> typing.Any:
+    """
+    Convert a configuration value to a type.
+
+    Booleans are parsed from strings like `"true"` and `"0"`, which would
+    otherwise all be true. Other strings are rejected with a `ValueError`.
+    """
+    if type_ is bool:
+        if isinstance(item, str):
+            return bool(strtobool(item))
+        if isinstance(item, int):
+            return bool(item)
+        raise TypeError(f"{item!r} is not a boolean")
+    return type_(item)
 
 
 class JSONGetter(type):
@@ -22,6 +59,10 @@ class JSONGetter(type):
     Supports getting configuration from up to two levels
     of nested configuration through `section` and `subsection`.
 
+    Annotated variables are resolved (including `"!ENV"` values) and type checked
+    once, when the class is created, and stored as read-only class attributes.
+    Missing or invalid variables are reported together at import.
+
     Example Usage:
         # config.json
         {
@@ -48,7 +89,75 @@ def get_prefix(bot, message):
 
     subsection = None
 
+    def __init__(cls, name: str, bases: tuple, namespace: dict):
+        super().__init__(name, bases, namespace)
+        if "section" not in namespace:
+            return
+        _CONFIG_CLASSES.append(cls)
+
+        # Resolve every annotated variable once, so accessing it later is a
+        # plain class attribute lookup instead of a call to `__getattr__`.
+        try:
+            cls._apply(cls._resolve(_CONFIG_JSON))
+        except (KeyError, TypeError, ValueError) as e:
+            _CONFIG_ERRORS.append(e.args[0])
+
+    @property
+    def _dotted_path(cls) -> str:
+        """Return the path of this class' configuration section."""
+        return ".".join(
+            (cls.section, cls.subsection)
+            if cls.subsection is not None
+            else (cls.section,)
+        )
+
+    def _section(cls, config: dict) -> dict:
+        """Return this class' configuration section of a config."""
+        try:
+            section = config[cls.section]
+            return section[cls.subsection] if cls.subsection is not None else section
+        except KeyError:
+            log.critical(f"Configuration section `{cls._dotted_path}` is missing.")
+            raise KeyError(f"`{cls._dotted_path}` is missing") from None
+
+    def _resolve(cls, config: dict) -> "dict[str, typing.Any]":
+        """Resolve and type check all the annotated variables of a config."""
+        section = cls._section(config)
+        values = {}
+        for name, type_ in cls.__annotations__.items():
+            dotted_path = f"{cls._dotted_path}.{name}"
+            try:
+                item = section[name]
+                if item == "!ENV":
+                    item = os.environ[name.upper()]
+            except KeyError:
+                log.critical(
+                    f"Configuration variable `{dotted_path}` could not be found."
+                )
+                raise KeyError(f"`{dotted_path}` is missing") from None
+
+            if not isinstance(item, type_):
+                try:
+                    item = _coerce(item, type_)
+                except (TypeError, ValueError):
+                    log.critical(
+                        f"Configuration variable `{dotted_path}` should be of type "
+                        + f"`{type_.__name__}`, but is `{item!r}`."
+                    )
+                    raise TypeError(f"`{dotted_path}` has the wrong type") from None
+            values[name] = item
+        return values
+
+    def _apply(cls, values: "dict[str, typing.Any]") -> None:
+        """Set resolved variables as class attributes."""
+        for name, value in values.items():
+            super().__setattr__(name, value)
+
+    def __setattr__(cls, name: str, value: typing.Any) -> None:
+        raise AttributeError(f"Configuration class `{cls.__name__}` is read-only.")
+
     def __getattr__(cls, name: str):
+        # Only reached for variables that aren't annotated, and so not resolved.
         name = name.lower()
 
         try:
@@ -77,7 +186,7 @@ def __getattr__(cls, name: str):
             raise
 
     def __getitem__(cls, name: str):
-        return cls.__getattr__(name)
+        return getattr(cls, name.lower())
 
     def __iter__(cls):
         """Return generator of key: value pairs of current constants class' config values."""  # noqa: B950
@@ -100,6 +209,16 @@ class Bot(metaclass=JSONGetter):
 
     prefix: str
     bot_token: str
+    chunk_guilds_at_startup: bool
+
+
+class Cache(metaclass=JSONGetter):
+    """Settings for what the bot keeps in memory."""
+
+    section = "cache"
+
+    profile: str
+    max_messages: int
 
 
 class Guild(metaclass=JSONGetter):
@@ -184,6 +303,27 @@ class Messages(metaclass=JSONGetter):
     roles: str
 
 
+class Logging(metaclass=JSONGetter):
+    """Logging settings."""
+
+    section = "logging"
+
+    queue_size: int
+    compress_rotated_logs: bool
+
+
+class Health(metaclass=JSONGetter):
+    """Settings for the local health and metrics server."""
+
+    section = "health"
+
+    enabled: bool
+    host: str
+    port: int
+    max_heartbeat_age: float
+    max_loop_lag: float
+
+
 class Emoji(metaclass=JSONGetter):
     """Emojis that the bot will use."""
 
@@ -196,17 +336,79 @@ class Emoji(metaclass=JSONGetter):
     green_check: str
 
 
+if _CONFIG_ERRORS:
+    raise KeyError(f"Invalid configuration: {', '.join(_CONFIG_ERRORS)}")
+
+
 # Groups
-BOT_ADMINS = [StaffRoles.bot_team_role, StaffRoles.admin_role]
-MOD_ROLES = [StaffRoles.mod_role, StaffRoles.admin_role]
-CLASS_ROLES = [
-    ClassRoles.grade_5,
-    ClassRoles.grade_6,
-    ClassRoles.grade_7,
-    ClassRoles.grade_8,
-    ClassRoles.freshmen,
-    ClassRoles.sophomores,
-    ClassRoles.juniors,
-    ClassRoles.seniors,
-    ClassRoles.alumni,
-]
+# These are updated in place on reload, so `from constants import X` stays current.
+BOT_ADMINS = []
+MOD_ROLES = []
+ADMIN_ROLES = []
+CLASS_ROLES = []
+
+
+def _update_groups() -> None:
+    """Recompute the groups of constants from the configuration classes."""
+    BOT_ADMINS[:] = [StaffRoles.bot_team_role, StaffRoles.admin_role]
+    MOD_ROLES[:] = [StaffRoles.mod_role, StaffRoles.admin_role]
+    ADMIN_ROLES[:] = [StaffRoles.admin_role]
+    CLASS_ROLES[:] = [
+        ClassRoles.grade_5,
+        ClassRoles.grade_6,
+        ClassRoles.grade_7,
+        ClassRoles.grade_8,
+        ClassRoles.freshmen,
+        ClassRoles.sophomores,
+        ClassRoles.juniors,
+        ClassRoles.seniors,
+        ClassRoles.alumni,
+    ]
+
+
+_update_groups()
+
+
+class LoadedConfig(typing.NamedTuple):
+    """A loaded and validated configuration, ready to be applied."""
+
+    raw: dict
+    values: "dict[JSONGetter, dict[str, typing.Any]]"
+
+
+def load() -> LoadedConfig:
+    """
+    Load and validate the configuration files without applying them.
+
+    This does blocking file I/O, so run it in an executor from async code.
+    Raises `KeyError`, `TypeError` or `ValueError` if the configuration is invalid.
+    """
+    raw = _load_config()
+    values = {}
+    errors = []
+    for cls in _CONFIG_CLASSES:
+        try:
+            values[cls] = cls._resolve(raw)
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append(e.args[0])
+
+    if errors:
+        raise KeyError(f"Invalid configuration: {', '.join(errors)}")
+    return LoadedConfig(raw, values)
+
+
+def apply(config: LoadedConfig) -> None:
+    """
+    Swap in a loaded configuration.
+
+    Nothing is awaited or read from disk here, so from the event loop's point of
+    view the whole configuration changes at once. Cogs that derive data from the
+    configuration should rebuild it in an `on_config_reload` listener.
+    """
+    global _CONFIG_JSON
+
+    _CONFIG_JSON = config.raw
+    for cls, values in config.values.items():
+        cls._apply(values)
+    _update_groups()
+    log.info("Applied reloaded configuration")
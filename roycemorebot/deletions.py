@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import logging
+import time
+import typing
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import discord
+from discord.ext import commands
+
+from roycemorebot.constants import Channels
+from roycemorebot.persistence import JSONStore
+from roycemorebot.priorities import BACKGROUND, set_priority
+
+log = logging.getLogger(__name__)
+
+ROLES_DELETE_DELAY = 5.0  # seconds
+BULK_DELETE_LIMIT = 100
+BULK_DELETE_MAX_AGE = 14 * 24 * 60 * 60 - 60  # seconds, a little less than 14 days
+
+
+class DeletionScheduler:
+    """
+    Delete messages after a delay, from a single background task.
+
+    Pending deletions are kept in a heap ordered by when they are due and saved
+    to `data/pending_deletions.json`, so they survive restarts. All the messages
+    due at the same time in a channel are deleted with one bulk delete request.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._heap = []  # (due UNIX timestamp, channel ID, message ID)
+        self._store = JSONStore(Path("data", "pending_deletions.json"), backups=0)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self) -> None:
+        """Start the background task deleting messages."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task, saving the pending deletions."""
+        if self._task is not None:
+            self._task.cancel()
+        self._save()
+        await self._store.flush()
+
+    def schedule(
+        self, *messages: discord.Message, delay: float = ROLES_DELETE_DELAY
+    ) -> None:
+        """Schedule messages for deletion after `delay` seconds."""
+        due = time.time() + delay
+        for message in messages:
+            heapq.heappush(self._heap, (due, message.channel.id, message.id))
+        self._save()
+        self._wakeup.set()
+
+    def _save(self) -> None:
+        """Save the pending deletions."""
+        self._store.save([list(entry) for entry in self._heap])
+
+    async def _run(self) -> None:
+        """Delete messages as they become due."""
+        set_priority(BACKGROUND)
+        saved = await self._store.load_async(default=[])
+        for entry in saved:
+            heapq.heappush(self._heap, tuple(entry))
+        if saved:
+            log.info(f"Loaded {len(saved)} pending message deletions")
+
+        await self.bot.wait_until_ready()
+        while True:
+            if not await self._wait_until_due():
+                continue
+
+            due = defaultdict(list)
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, channel_id, message_id = heapq.heappop(self._heap)
+                due[channel_id].append(message_id)
+
+            results = await asyncio.gather(
+                *(self._delete(channel_id, ids) for channel_id, ids in due.items()),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    log.error("Error deleting messages", exc_info=result)
+            self._save()
+
+    async def _wait_until_due(self) -> bool:
+        """Wait until the next deletion is due, or something new is scheduled."""
+        self._wakeup.clear()
+        if not self._heap:
+            await self._wakeup.wait()
+            return False
+
+        delay = self._heap[0][0] - time.time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            return False
+
+        return True
+
+    async def _delete(self, channel_id: int, message_ids: "list[int]") -> None:
+        """Delete messages from a channel, in bulk where possible."""
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            log.warning(f"Could not find channel {channel_id} to delete messages in")
+            return
+
+        # Messages that are too old can't be bulk deleted.
+        oldest_bulk_id = discord.utils.time_snowflake(
+            datetime.utcnow() - timedelta(seconds=BULK_DELETE_MAX_AGE)
+        )
+        bulk = [id_ for id_ in message_ids if id_ >= oldest_bulk_id]
+        single = [id_ for id_ in message_ids if id_ < oldest_bulk_id]
+
+        for i in range(0, len(bulk), BULK_DELETE_LIMIT):
+            chunk = bulk[i : i + BULK_DELETE_LIMIT]
+            try:
+                await channel.delete_messages([discord.Object(id_) for id_ in chunk])
+            except discord.NotFound:
+                pass  # A single message that was already deleted
+            except discord.HTTPException as e:
+                log.info(f"Bulk delete in {channel} failed, deleting one by one: {e}")
+                single += chunk
+            else:
+                log.trace("Deleted %s messages in %s", len(chunk), channel)
+
+        for message_id in single:
+            try:
+                await channel.get_partial_message(message_id).delete()
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                log.warning(f"Could not delete message {message_id}: {e}")
+
+
+async def send_but_delete_in_roles(
+    ctx: commands.Context, content: typing.Optional[str] = None, **kwargs
+) -> discord.Message:
+    """Send a message, but if it's in #roles, delete it and the command later."""
+    message = await ctx.send(content, **kwargs)
+    if ctx.channel.id == Channels.roles:
+        ctx.bot.deletions.schedule(ctx.message, message)
+    return message
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+import typing
+from pathlib import PurePosixPath
+
+import discord
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+GIT_TIMEOUT = 60.0  # seconds
+OUTPUT_INTERVAL = 1.0  # seconds between edits of the output message
+OUTPUT_LINES = 15  # last lines of output shown in the output message
+PACKAGE = "roycemorebot"
+
+
+class GitError(Exception):
+    """A git command failed or timed out."""
+
+    def __init__(self, message: str, output: str):
+        super().__init__(message, output)
+        self.output = output
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+
+class DeployPlan(typing.NamedTuple):
+    """What to do with the running bot after pulling changes."""
+
+    load: "list[str]"  # new extensions
+    reload: "list[str]"  # changed extensions
+    unload: "list[str]"  # deleted extensions
+    restart: "list[str]"  # changed core modules, which need a restart
+
+    @property
+    def empty(self) -> bool:
+        """Return whether nothing needs to be done."""
+        return not (self.load or self.reload or self.unload or self.restart)
+
+
+class OutputMessage:
+    """
+    A message showing the last lines of a command's output as it comes in.
+
+    Edits are throttled to one every `OUTPUT_INTERVAL` seconds, and `flush`
+    shows whatever is left at the end.
+    """
+
+    def __init__(self, message: discord.Message, title: str):
+        self.message = message
+        self.title = title
+        self.lines = []
+        self._last_edit = 0.0
+        self._edit_task = None
+
+    def _content(self) -> str:
+        output = "\n".join(self.lines[-OUTPUT_LINES:]).replace("```", "'''")
+        return f"{self.title}\n```\n{output or ' '}\n```"[:2000]
+
+    def write(self, line: str) -> None:
+        """Add a line of output, editing the message if it's been a while."""
+        self.lines.append(line)
+        if self._edit_task is None or self._edit_task.done():
+            delay = max(self._last_edit + OUTPUT_INTERVAL - time.monotonic(), 0)
+            self._edit_task = asyncio.get_event_loop().create_task(self._edit(delay))
+
+    async def _edit(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._last_edit = time.monotonic()
+        try:
+            await self.message.edit(content=self._content())
+        except discord.HTTPException as e:
+            log.warning(f"Could not update the output message: {e}")
+
+    async def flush(self, title: typing.Optional[str] = None) -> None:
+        """Show all the output so far, with a new title if given."""
+        if self._edit_task is not None:
+            self._edit_task.cancel()
+        if title is not None:
+            self.title = title
+        await self._edit(0)
+
+
+async def run_git(
+    *args: str, on_output: typing.Optional[typing.Callable[[str], None]] = None
+) -> str:
+    """
+    Run a git command without blocking the event loop, returning its output.
+
+    Lines of output are passed to `on_output` as they come in. Raises
+    `GitError` if the command fails or takes longer than `GIT_TIMEOUT`.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "git",
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    lines = []
+
+    async def read_output() -> None:
+        async for raw_line in process.stdout:
+            line = raw_line.decode("utf-8", errors="replace").rstrip()
+            lines.append(line)
+            if on_output is not None:
+                on_output(line)
+        await process.wait()
+
+    try:
+        await asyncio.wait_for(read_output(), GIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise GitError(
+            f"`git {' '.join(args)}` timed out after {GIT_TIMEOUT:.0f}s",
+            "\n".join(lines),
+        ) from None
+
+    output = "\n".join(lines)
+    if process.returncode != 0:
+        raise GitError(
+            f"`git {' '.join(args)}` exited with code {process.returncode}", output
+        )
+    return output
+
+
+async def pull(
+    on_output: typing.Optional[typing.Callable[[str], None]] = None,
+) -> "list[tuple[str, str]]":
+    """
+    Pull new changes, returning the status and path of every changed file.
+
+    Statuses are the ones of `git diff --name-status`, like `A` for added.
+    """
+    old = await run_git("rev-parse", "HEAD")
+    await run_git("pull", on_output=on_output)
+    new = await run_git("rev-parse", "HEAD")
+    if old == new:
+        return []
+
+    log.info(f"Pulled {old[:7]}..{new[:7]}")
+    diff = await run_git("diff", "--name-status", "--no-renames", old, new)
+    return [tuple(line.split("\t", 1)) for line in diff.splitlines() if line]
+
+
+def plan(
+    changes: "typing.Iterable[tuple[str, str]]", loaded: "typing.Iterable[str]"
+) -> DeployPlan:
+    """
+    Work out which extensions to (re)load, and whether the bot must restart.
+
+    Extensions are the public modules directly in `roycemorebot/exts`, and can be
+    reloaded in place. Any other changed Python module of the bot is imported
+    by other modules, so the bot has to restart for it to take effect. Config
+    files are reloaded by the Config cog when they change.
+    """
+    loaded = set(loaded)
+    deploy_plan = DeployPlan([], [], [], [])
+    for status, path in changes:
+        file = PurePosixPath(path)
+        if file.suffix != ".py" or file.parts[0] != PACKAGE:
+            continue
+
+        module = ".".join(file.with_suffix("").parts)
+        if file.parent.as_posix() != f"{PACKAGE}/exts" or file.stem.startswith("_"):
+            deploy_plan.restart.append(module)
+        elif status == "D":
+            if module in loaded:
+                deploy_plan.unload.append(module)
+        elif module in loaded:
+            deploy_plan.reload.append(module)
+        else:
+            deploy_plan.load.append(module)
+    return deploy_plan
+
+
+def apply(bot: commands.Bot, deploy_plan: DeployPlan) -> "list[str]":
+    """
+    Load, reload and unload extensions as planned, returning what went wrong.
+
+    A failed reload leaves the old version of the extension loaded.
+    """
+    errors = []
+    steps = (
+        ("unload", bot.unload_extension, deploy_plan.unload),
+        ("reload", bot.reload_extension, deploy_plan.reload),
+        ("load", bot.load_extension, deploy_plan.load),
+    )
+    for verb, step, extensions in steps:
+        for extension in extensions:
+            try:
+                step(extension)
+            except commands.ExtensionError as e:
+                log.exception(f"Could not {verb} `{extension}`")
+                errors.append(f"Could not {verb} `{extension}`: {e}")
+            else:
+                log.info(f"Deployed `{extension}` ({verb}ed)")
+    return errors
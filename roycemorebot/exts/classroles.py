@@ -1,69 +1,171 @@
-import asyncio
 import logging
 import textwrap
+import typing
+from pathlib import Path
 
 import discord
 from discord.ext import commands
 
-from roycemorebot.checks import has_any_role_check, has_no_roles_check
-from roycemorebot.constants import CLASS_ROLES, Channels, MOD_ROLES
+from roycemorebot.checks import (
+    has_any_role_check,
+    has_any_role_in,
+    has_no_roles_check,
+)
+from roycemorebot.class_index import ClassRoleIndex
+from roycemorebot.constants import CLASS_ROLES, MOD_ROLES
 from roycemorebot.constants import ClassRoles as CRoles
 from roycemorebot.constants import Emoji, Guild, Messages
+from roycemorebot.deletions import send_but_delete_in_roles
+from roycemorebot.jobs import BulkRoleJob, RoleChange
+from roycemorebot.members import MemberRecord, ensure_chunked, is_chunked
+from roycemorebot.members import store as member_store
+from roycemorebot.persistence import JSONStore
+from roycemorebot.roles import RoleTransaction
+from roycemorebot.welcome import WelcomeQueue
 
 log = logging.getLogger(__name__)
 
+NEW_GRADE_JOB = "new-grade"
+MODMAIL_ID = 575252669443211264
+# IDs of the members who joined but haven't passed membership screening yet.
+PENDING_MEMBERS_STORE = JSONStore(Path("data", "pending_members.json"), backups=0)
+
 WELCOME_MESSAGE = textwrap.dedent(
-    f"""\
+    """\
     **__To get started:__**
     - Read the rules if you didn't already.
 
-    - **Go to the [#roles]({Messages.roles}) channel** and get a Class Role.
+    - **Go to the [#roles]({roles}) channel** and get a Class Role.
     *Note: __This is mandatory!__ Read Rule #6.*
 
     - Set your nickname to your real name (`/nick NAME`) to help others identify you.
 
     - To contact mods, DM ModMail#5460 or ping them if they are needed immediately.
 
-    - Server invite link is {Guild.invite_link}. Invite your friends!
+    - Server invite link is {invite_link}. Invite your friends!
 
-    All of this, and more, is described in [#welcome]({Messages.welcome}).
+    All of this, and more, is described in [#welcome]({welcome}).
     """
 )
 
 
+def _format_welcome_message() -> str:
+    """Fill in the welcome message with the links from the config."""
+    return WELCOME_MESSAGE.format(
+        roles=Messages.roles, invite_link=Guild.invite_link, welcome=Messages.welcome
+    )
+
+
 class ClassRoles(commands.Cog, name="Class Roles"):
     """User-assigned roles based on their grade."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self._new_grade_job = None
+        self.indexes = {}  # guild ID -> ClassRoleIndex
+        self.welcomes = WelcomeQueue(_format_welcome_message())
+        # Kept across restarts, as members who joined before one aren't cached
+        # or stored, and their verification can't be told apart from any update.
+        # Cogs are loaded before the bot connects, so blocking here is fine.
+        self._pending = set(PENDING_MEMBERS_STORE.load(default=[]))
+
+    @property
+    def new_grade_job(self) -> typing.Optional[BulkRoleJob]:
+        """The running class roles update job, if any."""
+        return self._new_grade_job
+
+    def cog_unload(self) -> None:
+        """Stop sending welcome messages."""
+        self.welcomes.stop()
+
+    def _set_pending(self, member_id: int, pending: bool) -> None:
+        """Remember whether a member is still pending, saving it if it changed."""
+        if pending == (member_id in self._pending):
+            return
+        if pending:
+            self._pending.add(member_id)
+        else:
+            self._pending.discard(member_id)
+        PENDING_MEMBERS_STORE.save(sorted(self._pending))
+
+    @commands.Cog.listener()
+    async def on_config_reload(self) -> None:
+        """Rebuild everything that depends on the config."""
+        self.welcomes.description = _format_welcome_message()
+        self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        """Rebuild the class role indexes of the guilds whose members are known."""
+        self.indexes.clear()
+        for guild in self.bot.guilds:
+            if is_chunked(guild):
+                self._build_index(guild)
+
+    def _build_index(self, guild: discord.Guild) -> ClassRoleIndex:
+        """Build the class role index of a guild from its cached or stored members."""
+        index = ClassRoleIndex(CLASS_ROLES)
+        if guild.chunked:
+            index.build(guild.members)
+        else:
+            index.build_from_records(member_store.records(guild.id))
+        self.indexes[guild.id] = index
+        return index
+
+    async def get_index(self, guild: discord.Guild) -> ClassRoleIndex:
+        """Get the class role index of a guild, caching its members if needed."""
+        if guild.id not in self.indexes:
+            await ensure_chunked(guild)
+            if guild.id not in self.indexes:  # Unless built while waiting
+                self._build_index(guild)
+        return self.indexes[guild.id]
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member) -> None:
+        """Add new members to the class role index and remember pending ones."""
+        if member.guild.id in self.indexes:
+            self.indexes[member.guild.id].update(member)
+        self._set_pending(member.id, member.pending)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member) -> None:
+        """Remove members that left from the class role index."""
+        if member.guild.id in self.indexes:
+            self.indexes[member.guild.id].remove(member.id)
+        self._set_pending(member.id, False)
+
+    @commands.Cog.listener()
+    async def on_uncached_member_remove(
+        self, guild: discord.Guild, member_id: int
+    ) -> None:
+        """Remove members that left from the class role index, even if not cached."""
+        if guild.id in self.indexes:
+            self.indexes[guild.id].remove(member_id)
+        self._set_pending(member_id, False)
 
     @commands.Cog.listener()
     async def on_member_update(self, old: discord.Member, new: discord.Member) -> None:
-        """Send a welcome message to new members of the server."""
-        if old.pending and not new.pending:
-            # Someone has just verified, send them a welcome message!
-            embed = discord.Embed(
-                color=discord.Colour.green(),
-                description=WELCOME_MESSAGE,
-            ).set_author(
-                name="Welcome to the Roycemore Discord Server!",
-                icon_url=new.guild.icon_url,
-            )
+        """Keep the class role index updated and welcome newly verified members."""
+        if new.guild.id in self.indexes and old.roles != new.roles:
+            self.indexes[new.guild.id].update(new)
 
-            log.trace(new.guild.icon_url)
-            log.info(f"Member {new} has just verified, sending them a welcome message!")
+        if old.pending and not new.pending:
+            self.welcomes.enqueue(new)
+        self._set_pending(new.id, new.pending)
 
-            await new.send(embed=embed)
+    @commands.Cog.listener()
+    async def on_uncached_member_update(
+        self, member: discord.Member, old: typing.Optional[MemberRecord]
+    ) -> None:
+        """Keep the class role index updated and welcome newly verified members."""
+        if member.guild.id in self.indexes:
+            self.indexes[member.guild.id].update(member)
 
-    @staticmethod
-    async def _send_but_delete_in_roles(ctx: commands.Context, message: str) -> None:
-        """Send a message, but if it's in #roles, delete it after 5 seconds."""
-        if ctx.message.channel.id == Channels.roles:
-            await ctx.send(message, delete_after=5.0)
-            await asyncio.sleep(5.0)
-            await ctx.message.delete()
-        else:
-            await ctx.send(message)
+        # Only welcome on a verification that was seen happen. Guessing from the
+        # new state alone welcomes members again after a restart.
+        was_pending = old.pending if old is not None else member.id in self._pending
+        if was_pending and not member.pending:
+            self.welcomes.enqueue(member)
+        self._set_pending(member.id, member.pending)
 
     async def _add_class_role(
         self, ctx: commands.Context, user: discord.Member, role: int, role_name: str
@@ -74,59 +176,43 @@ async def _add_class_role(
             user = ctx.author
         # Check if the user is not a mod and they tried to give someone else a role.
         if user != ctx.author and await has_no_roles_check(ctx, *MOD_ROLES):
-            await self._send_but_delete_in_roles(
+            await send_but_delete_in_roles(
                 ctx,
                 f"{Emoji.no} You cannot assign a user other than yourself a class "
                 + "role.",
             )
             return
-        elif user != ctx.author and await has_any_role_check(ctx, *MOD_ROLES):
+        elif user != ctx.author:  # A moderator
             log.info(
                 f"Replacing {user}'s class roles at request of moderator {ctx.author}"
             )
-            for old_role in CLASS_ROLES:
-                await user.remove_roles(
-                    discord.Object(old_role),
-                    reason=f"Moderator {ctx.author} replacing {user}'s Class Roles",
-                )
-            await user.add_roles(discord.Object(role), reason="Class Roles")
-            log.trace(f"Assigned {user} the {role_name} role")
-            await self._send_but_delete_in_roles(
+            await RoleTransaction(user).remove(*CLASS_ROLES).add(role).commit(
+                reason=f"Moderator {ctx.author} replacing {user}'s Class Roles"
+            )
+            log.trace("Assigned %s the %s role", user, role_name)
+            await send_but_delete_in_roles(
                 ctx, f"{Emoji.ok} User `{user}` has been given the {role_name} role."
             )
             return
 
         # Check if the user is self-roleing and already has a class role.
         if user == ctx.author and await has_any_role_check(ctx, *CLASS_ROLES):
-            modmail = discord.utils.get(ctx.guild.members, id=575252669443211264)
-            await self._send_but_delete_in_roles(
+            await send_but_delete_in_roles(
                 ctx,
                 f"{Emoji.no} You already have a class role. If you mistakenly "
-                + f"assigned the wrong role, contact {modmail.mention}.",
+                + f"assigned the wrong role, contact <@{MODMAIL_ID}>.",
             )
             return
 
-        await user.add_roles(discord.Object(role), reason="Class Roles")
+        await RoleTransaction(user).add(role).commit(reason="Class Roles")
         log.info(f"Assigned {user} the {role_name} role")
 
-        await self._send_but_delete_in_roles(
+        await send_but_delete_in_roles(
             ctx,
             f"{ctx.author.mention}, you have successfully been given the "
             + f"{role_name} role.",
         )
 
-    async def _update_class_role(
-        self, user: discord.Member, old_role: discord.Role, new_role: discord.Role
-    ) -> None:
-        """Move a class role up one."""
-        await user.remove_roles(old_role, reason="Class Roles update.")
-        await user.add_roles(new_role, reason="Class Roles update.")
-        # await user.send(
-        #     f"Your grade level role has been changed to {new_role.name}. "
-        #     + "Have a great school year!"
-        # )
-        log.trace(f"{user} has been moved from {old_role} to {new_role}")
-
     @commands.guild_only()
     @commands.command(name="5th-grade", aliases=("5th", "5th-grader"))
     async def grade_5(self, ctx: commands.Context, user: discord.Member = None) -> None:
@@ -185,56 +271,102 @@ async def alum(self, ctx: commands.Context, user: discord.Member = None) -> None
         """Give an alum the `Alumni` role."""
         await self._add_class_role(ctx, user, CRoles.alumni, "Alumni")
 
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        """Build the class role indexes and resume an interrupted update."""
+        # The caches may have been rebuilt, and guilds are only chunked at
+        # startup if configured to. Other indexes are built when first needed.
+        self._build_indexes()
+
+        if self._new_grade_job is not None:
+            return
+
+        job = await BulkRoleJob.load(self.bot, NEW_GRADE_JOB)
+        if job is not None:
+            log.info("Resuming interrupted class roles update")
+            await self._run_new_grade_job(job)
+
+    async def _run_new_grade_job(self, job: BulkRoleJob) -> None:
+        """Run a class roles update job, making sure only one runs at a time."""
+        self._new_grade_job = job
+        try:
+            await job.run()
+        finally:
+            self._new_grade_job = None
+        log.info("Class roles update finished")
+
+    async def _plan_new_grade(self, guild: discord.Guild) -> "list[RoleChange]":
+        """Plan moving everyone's grade level role up one."""
+        index = await self.get_index(guild)
+        changes = []
+        planned = set()
+        # Alumni stay alumni, so only look at the roles before them.
+        for old_role, new_role in zip(CLASS_ROLES, CLASS_ROLES[1:]):
+            for member_id in index.members_with(old_role) - planned:
+                changes.append(RoleChange(member_id, (old_role,), (new_role,)))
+                planned.add(member_id)
+            log.trace("Planned moving members from %s to %s", old_role, new_role)
+        return changes
+
     @commands.guild_only()
     @commands.has_permissions(manage_roles=True)
     @commands.command(name="new-grade", aliases=("ng", "new-school-year"))
     async def new_grade(self, ctx: commands.Context) -> None:
         """Move everyone's grade level role up one."""
-        log.info(f"Started role update at the request of {ctx.author}")
-        # Make role IDs into objects for easier comparison:
-        grade_5 = ctx.guild.get_role(CRoles.grade_5)
-        grade_6 = ctx.guild.get_role(CRoles.grade_6)
-        grade_7 = ctx.guild.get_role(CRoles.grade_7)
-        grade_8 = ctx.guild.get_role(CRoles.grade_8)
-
-        freshmen = ctx.guild.get_role(CRoles.freshmen)
-        sophomores = ctx.guild.get_role(CRoles.sophomores)
-        juniors = ctx.guild.get_role(CRoles.juniors)
-        seniors = ctx.guild.get_role(CRoles.seniors)
-        alumni = ctx.guild.get_role(CRoles.alumni)
-        log.trace(f"Freshmen role: {freshmen}")
-
-        for member in ctx.guild.members:
-            if grade_5 in member.roles:
-                await self._update_class_role(member, grade_5, grade_6)
-            elif grade_6 in member.roles:
-                await self._update_class_role(member, grade_6, grade_7)
-            elif grade_7 in member.roles:
-                await self._update_class_role(member, grade_7, grade_8)
-            elif grade_8 in member.roles:
-                await self._update_class_role(member, grade_8, freshmen)
-            elif freshmen in member.roles:
-                await self._update_class_role(member, freshmen, sophomores)
-            elif sophomores in member.roles:
-                await self._update_class_role(member, sophomores, juniors)
-            elif juniors in member.roles:
-                await self._update_class_role(member, juniors, seniors)
-            elif seniors in member.roles:
-                await member.remove_roles(seniors, reason="Class Roles update.")
-                await member.add_roles(alumni, reason="Class Roles update.")
-                # await member.send(
-                #     f"Your grade level role has been changed to {alumni.name}. "
-                #     + "Have fun in college!"
-                # )
-                log.trace(f"{member} has been moved from {seniors} to {alumni}")
-            else:
-                log.trace(
-                    f"{member} was either a bot or an alum, their class roles were "
-                    + f"not changed. Their roles are: {member.roles}"
-                )
-        log.info("Class roles update finished")
+        if self._new_grade_job is not None:
+            await ctx.send(f"{Emoji.no} A class roles update is already running.")
+            return
+
+        job = await BulkRoleJob.load(self.bot, NEW_GRADE_JOB)
+        if job is not None:
+            log.info(f"Resuming class roles update at the request of {ctx.author}")
+            await ctx.send(
+                f"{Emoji.warning} Resuming the interrupted class roles update."
+            )
+            job.channel_id = ctx.channel.id
+        else:
+            log.info(f"Started role update at the request of {ctx.author}")
+            job = BulkRoleJob(
+                self.bot,
+                NEW_GRADE_JOB,
+                ctx.guild.id,
+                ctx.channel.id,
+                await self._plan_new_grade(ctx.guild),
+                "Class Roles update.",
+            )
+
+        await self._run_new_grade_job(job)
         await ctx.send("Updated all class roles!")
 
+    @commands.guild_only()
+    @commands.command(name="class-counts", aliases=("classes", "cc"))
+    async def class_counts(self, ctx: commands.Context) -> None:
+        """Show how many members have each class role."""
+        counts = (await self.get_index(ctx.guild)).counts()
+        embed = discord.Embed(title="Class Roles", color=discord.Colour.green())
+        for role_id, count in counts.items():
+            role = ctx.guild.get_role(role_id)
+            embed.add_field(
+                name=role.name if role else str(role_id), value=str(count), inline=True
+            )
+        await ctx.send(embed=embed)
+
+    @commands.guild_only()
+    @has_any_role_in(MOD_ROLES)
+    @commands.command(name="no-class", aliases=("unassigned", "nc"))
+    async def no_class(self, ctx: commands.Context) -> None:
+        """List the members without a class role."""
+        unassigned = (await self.get_index(ctx.guild)).unassigned
+        if not unassigned:
+            await ctx.send(f"{Emoji.ok} Everyone has a class role.")
+            return
+
+        mentions = " ".join(f"<@{member_id}>" for member_id in unassigned)
+        message = f"{len(unassigned)} members have no class role:\n{mentions}"
+        if len(message) > 2000:
+            message = message[:1996].rsplit(" ", 1)[0] + " ..."
+        await ctx.send(message, allowed_mentions=discord.AllowedMentions.none())
+
 
 def setup(bot: commands.Bot) -> None:
     """Add the ClassRoles cog to the bot."""
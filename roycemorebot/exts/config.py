@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import os
+import time
+
+import discord
+from discord.ext import commands, tasks
+
+from roycemorebot import constants
+from roycemorebot.checks import has_any_role_in
+from roycemorebot.constants import BOT_ADMINS, Emoji
+
+log = logging.getLogger(__name__)
+
+CONFIG_FILES = ("config-default.json", "config.json")
+POLL_INTERVAL = 2.0  # seconds
+
+
+def _modification_times() -> "tuple[float, ...]":
+    """Return the modification times of the config files, or 0 if missing."""
+    times = []
+    for file in CONFIG_FILES:
+        try:
+            times.append(os.stat(file).st_mtime)
+        except FileNotFoundError:
+            times.append(0.0)
+    return tuple(times)
+
+
+class Config(commands.Cog):
+    """Reload the bot's configuration without restarting it."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._mtimes = _modification_times()
+        self._lock = asyncio.Lock()
+        self.watch_config.start()
+
+    def cog_unload(self) -> None:
+        """Stop watching the config files."""
+        self.watch_config.cancel()
+
+    async def reload_config(self) -> None:
+        """
+        Load, validate and apply the config files, then notify the cogs.
+
+        The files are read and validated in an executor, so an invalid config
+        raises before anything is changed. Cogs are notified through the
+        `on_config_reload` event.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            loop = asyncio.get_event_loop()
+            config = await loop.run_in_executor(None, constants.load)
+
+            constants.apply(config)
+            self.bot.dispatch("config_reload")
+            log.info(
+                f"Reloaded config in {(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+
+    @tasks.loop(seconds=POLL_INTERVAL)
+    async def watch_config(self) -> None:
+        """Reload the config when one of the config files changes."""
+        mtimes = _modification_times()
+        if mtimes == self._mtimes:
+            return
+        self._mtimes = mtimes
+
+        log.info("Config files changed, reloading them")
+        try:
+            await self.reload_config()
+        except (KeyError, TypeError, ValueError) as e:
+            log.error(f"Not reloading invalid config: {e.args[0]}")
+
+    @commands.Cog.listener()
+    async def on_config_reload(self) -> None:
+        """Update the bot's activity with the (possibly new) prefix."""
+        await self.bot.change_presence(
+            activity=discord.Activity(
+                type=discord.ActivityType.watching,
+                name=f"{constants.Bot.prefix}help",
+            )
+        )
+
+    @has_any_role_in(BOT_ADMINS)
+    @commands.group(name="config", aliases=("cfg",), invoke_without_command=True)
+    async def config_group(self, ctx: commands.Context) -> None:
+        """Commands group for managing the bot's configuration."""
+        await ctx.send_help(ctx.command)
+
+    @has_any_role_in(BOT_ADMINS)
+    @config_group.command(aliases=("r",))
+    async def reload(self, ctx: commands.Context) -> None:
+        """Reload the config files."""
+        log.info(f"{ctx.author} requested a config reload")
+        try:
+            await self.reload_config()
+        except (KeyError, TypeError, ValueError) as e:
+            await ctx.send(
+                f"{Emoji.warning} The config is invalid and was not reloaded:\n"
+                + f"```\n{e.args[0]}\n```"
+            )
+        else:
+            await ctx.send(f"{Emoji.ok} Successfully reloaded the config!")
+
+
+def setup(bot: commands.Bot) -> None:
+    """Add the Config cog to the bot."""
+    bot.add_cog(Config(bot))
@@ -0,0 +1,170 @@
+import logging
+import typing
+from datetime import datetime, timedelta
+
+import discord
+from discord.ext import commands
+
+from roycemorebot.checks import has_any_role_in
+from roycemorebot.constants import Emoji, MOD_ROLES
+from roycemorebot.infractions import Infraction
+from roycemorebot.infractions import store as infraction_store
+
+log = logging.getLogger(__name__)
+
+# 10 fields of at most ~300 characters stay well under the 6000 of an embed.
+PAGE_SIZE = 10
+REASON_LENGTH = 200  # characters of a reason shown in a list
+
+
+def _format_infraction(infraction: Infraction) -> "tuple[str, str]":
+    """Return the embed field name and value of an infraction."""
+    reason = infraction.reason or "No reason given"
+    if len(reason) > REASON_LENGTH:
+        reason = reason[: REASON_LENGTH - 1] + "…"
+    return (
+        f"#{infraction.id} {infraction.kind.title()} · "
+        + f"{infraction.created_at:%Y-%m-%d %H:%M} UTC",
+        f"User: <@{infraction.user_id}>, moderator: <@{infraction.moderator_id}>\n"
+        + reason,
+    )
+
+
+def _page_embed(
+    title: str, infractions: "list[Infraction]", page: int, total: int
+) -> discord.Embed:
+    """Return an embed listing a page of infractions."""
+    pages = max((total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    embed = discord.Embed(title=title, color=discord.Colour.orange())
+    for infraction in infractions:
+        name, value = _format_infraction(infraction)
+        embed.add_field(name=name, value=value, inline=False)
+    if not infractions:
+        embed.description = "No infractions here."
+    embed.set_footer(text=f"Page {page} of {pages} · {total} infractions")
+    return embed
+
+
+class Infractions(commands.Cog):
+    """Warnings and notes on users, and their history."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def _record(
+        self,
+        ctx: commands.Context,
+        user: discord.abc.User,
+        kind: str,
+        reason: typing.Optional[str],
+    ) -> Infraction:
+        infraction = await infraction_store.add(user.id, ctx.author.id, kind, reason)
+        log.info(
+            f"Moderator {ctx.author} gave {user} {kind} #{infraction.id}: {reason}"
+        )
+        return infraction
+
+    @commands.guild_only()
+    @has_any_role_in(MOD_ROLES)
+    @commands.command()
+    async def warn(
+        self, ctx: commands.Context, member: discord.Member, *, reason: str
+    ) -> None:
+        """Warn a member, letting them know why by DM."""
+        infraction = await self._record(ctx, member, "warning", reason)
+
+        try:
+            await member.send(
+                embed=discord.Embed(
+                    title=f"You have been warned in {ctx.guild.name}",
+                    description=reason,
+                    color=discord.Colour.orange(),
+                )
+            )
+        except discord.HTTPException:
+            dm_note = ", but they couldn't be sent a DM"
+        else:
+            dm_note = ""
+        await ctx.send(
+            f"{Emoji.ok} Warned {member} (infraction #{infraction.id}){dm_note}."
+        )
+
+    @commands.guild_only()
+    @has_any_role_in(MOD_ROLES)
+    @commands.command()
+    async def note(
+        self, ctx: commands.Context, user: discord.User, *, reason: str
+    ) -> None:
+        """Add a note on a user that only moderators can see."""
+        infraction = await self._record(ctx, user, "note", reason)
+        await ctx.send(f"{Emoji.ok} Added note #{infraction.id} on {user}.")
+
+    @commands.guild_only()
+    @has_any_role_in(MOD_ROLES)
+    @commands.group(
+        name="infractions", aliases=("infr", "history"), invoke_without_command=True
+    )
+    async def infractions_group(
+        self, ctx: commands.Context, user: discord.User, page: int = 1
+    ) -> None:
+        """View a page of a user's infractions, newest first."""
+        page = max(page, 1)
+        infractions = await infraction_store.by_user(
+            user.id, PAGE_SIZE, (page - 1) * PAGE_SIZE
+        )
+        total = await infraction_store.count_by_user(user.id)
+        await ctx.send(
+            embed=_page_embed(f"Infractions of {user}", infractions, page, total)
+        )
+
+    @commands.guild_only()
+    @has_any_role_in(MOD_ROLES)
+    @infractions_group.command(name="by", aliases=("moderator", "mod"))
+    async def by_moderator(
+        self, ctx: commands.Context, moderator: discord.User, page: int = 1
+    ) -> None:
+        """View a page of the infractions a moderator gave, newest first."""
+        page = max(page, 1)
+        infractions = await infraction_store.by_moderator(
+            moderator.id, PAGE_SIZE, (page - 1) * PAGE_SIZE
+        )
+        total = await infraction_store.count_by_moderator(moderator.id)
+        await ctx.send(
+            embed=_page_embed(
+                f"Infractions given by {moderator}", infractions, page, total
+            )
+        )
+
+    @commands.guild_only()
+    @has_any_role_in(MOD_ROLES)
+    @infractions_group.command(name="recent", aliases=("r",))
+    async def recent(self, ctx: commands.Context, days: int = 7, page: int = 1) -> None:
+        """View a page of the infractions of the last few days, newest first."""
+        days = max(days, 1)
+        page = max(page, 1)
+        since = datetime.utcnow() - timedelta(days=days)
+        infractions = await infraction_store.since(
+            since, PAGE_SIZE, (page - 1) * PAGE_SIZE
+        )
+        total = await infraction_store.count_since(since)
+        await ctx.send(
+            embed=_page_embed(
+                f"Infractions of the last {days} days", infractions, page, total
+            )
+        )
+
+    @commands.guild_only()
+    @has_any_role_in(MOD_ROLES)
+    @infractions_group.command(name="remove", aliases=("rm", "delete"))
+    async def remove(self, ctx: commands.Context, infraction_id: int) -> None:
+        """Delete an infraction."""
+        if await infraction_store.delete(infraction_id):
+            log.info(f"Moderator {ctx.author} removed infraction #{infraction_id}")
+            await ctx.send(f"{Emoji.ok} Removed infraction #{infraction_id}.")
+        else:
+            await ctx.send(f"{Emoji.no} There is no infraction #{infraction_id}.")
+
+
+def setup(bot: commands.Bot) -> None:
+    """Add the Infractions cog to the bot."""
+    bot.add_cog(Infractions(bot))
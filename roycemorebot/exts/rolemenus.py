@@ -0,0 +1,444 @@
+import asyncio
+import logging
+import typing
+from pathlib import Path
+
+import discord
+from discord.ext import commands
+
+from roycemorebot.checks import has_any_role_in, role_masks
+from roycemorebot.constants import (
+    ADMIN_ROLES,
+    CLASS_ROLES,
+    Channels,
+    Emoji,
+    Guild,
+    PronounRoles,
+)
+from roycemorebot.metrics import registry
+from roycemorebot.persistence import JSONStore
+from roycemorebot.priorities import BACKGROUND, priority
+
+log = logging.getLogger(__name__)
+
+ROLE_MENUS_STORE = JSONStore(Path("data", "role_menus.json"))
+MENU_KINDS = ("class", "pronouns", "announcements")
+# Regional indicators 🇦 to 🇹, as a message can only have 20 different reactions.
+OPTION_EMOJIS = tuple(chr(0x1F1E6 + i) for i in range(20))
+SYNC_DELAY = 2.0  # seconds to wait for more changes before updating the menus
+# Seconds after giving a class role in which the member's other class reactions
+# are denied, as their reaction payloads may not show the new role yet.
+CLASS_GRANT_GRACE = 5.0
+
+MENU_TITLES = {
+    "class": "Class Roles",
+    "pronouns": "Pronoun Roles",
+    "announcements": "Announcement Subscriptions",
+}
+MENU_HELP = {
+    "class": "React with your class to get its role. Ask a moderator to change it.",
+    "pronouns": "React to get a pronoun role, and remove your reaction to drop it.",
+    "announcements": "React to subscribe to announcements, and remove your reaction "
+    + "to unsubscribe.",
+}
+
+
+class RoleMenu:
+    """
+    A message in which members toggle roles by reacting.
+
+    Each option has its own emoji, which it keeps for as long as it's on the
+    menu, so the reactions members already added stay meaningful when other
+    options are added or removed.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        channel_id: int,
+        message_id: int,
+        options: "typing.Optional[dict[str, int]]" = None,
+    ):
+        self.kind = kind
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.options = options or {}  # emoji -> role ID
+
+    @classmethod
+    def from_json(cls: "type[RoleMenu]", data: "dict[str, typing.Any]") -> "RoleMenu":
+        """Load a menu saved with `to_json`."""
+        return cls(
+            data["kind"],
+            data["channel_id"],
+            data["message_id"],
+            {emoji: int(role_id) for emoji, role_id in data["options"].items()},
+        )
+
+    def to_json(self) -> "dict[str, typing.Any]":
+        """Return the menu as JSON-serializable data."""
+        return {
+            "kind": self.kind,
+            "channel_id": self.channel_id,
+            "message_id": self.message_id,
+            "options": dict(self.options),
+        }
+
+    @property
+    def free_emojis(self) -> "list[str]":
+        """Return the emojis not used by an option yet."""
+        return [emoji for emoji in OPTION_EMOJIS if emoji not in self.options]
+
+    def content(self, guild: discord.Guild) -> str:
+        """Return the text of the menu message."""
+        lines = [f"**{MENU_TITLES[self.kind]}**", MENU_HELP[self.kind], ""]
+        for emoji in OPTION_EMOJIS:
+            if emoji in self.options:
+                role = guild.get_role(self.options[emoji])
+                lines.append(f"{emoji} {role.name if role else 'Deleted role'}")
+        return "\n".join(lines)
+
+
+class RoleMenus(commands.Cog, name="Role Menus"):
+    """
+    Menus in #roles that members toggle their roles with by reacting.
+
+    A toggle is a single role edit request: the bot doesn't reply, and there is
+    no command message to delete afterwards. The options of every menu message
+    are kept in memory, so a reaction is mapped to its role without any lookup
+    or request. Menus are updated when the announcement roles or the config
+    change.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._menus = {}  # message ID -> RoleMenu
+        self._sync_lock = asyncio.Lock()
+        self._sync_task = None
+        self._sync_wanted = False
+        self._class_grants = set()  # IDs of the members recently given a class role
+        self._load()
+        self._schedule_sync()
+
+    def cog_unload(self) -> None:
+        """Stop updating the menus."""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+
+    def _load(self) -> None:
+        # Cogs are loaded before the bot connects, so blocking here is fine.
+        for data in ROLE_MENUS_STORE.load(default=[]):
+            menu = RoleMenu.from_json(data)
+            self._menus[menu.message_id] = menu
+        if self._menus:
+            log.info(f"Loaded {len(self._menus)} role menus")
+
+    def _save(self) -> None:
+        ROLE_MENUS_STORE.save([menu.to_json() for menu in self._menus.values()])
+
+    def _menus_of(self, kind: str) -> "list[RoleMenu]":
+        """Return the menu messages of a kind, oldest first."""
+        return sorted(
+            (menu for menu in self._menus.values() if menu.kind == kind),
+            key=lambda menu: menu.message_id,
+        )
+
+    def _role_ids(self, kind: str) -> "typing.Optional[list[int]]":
+        """Return the roles a kind of menu should offer, or `None` if unknown."""
+        if kind == "class":
+            return list(CLASS_ROLES)
+        if kind == "pronouns":
+            return [PronounRoles.he_him, PronounRoles.she_her, PronounRoles.they_them]
+
+        subscriptions = self.bot.get_cog("Subscriptions")
+        if subscriptions is None:
+            return None
+        return [
+            info["id"] for _, info in sorted(subscriptions.announcement_roles.items())
+        ]
+
+    def _schedule_sync(self) -> None:
+        """Update the menus soon, once whatever is changing settles."""
+        self._sync_wanted = True
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.get_event_loop().create_task(self._sync_later())
+
+    async def _sync_later(self) -> None:
+        await self.bot.wait_until_ready()
+        while self._sync_wanted:
+            self._sync_wanted = False
+            await asyncio.sleep(SYNC_DELAY)
+            guild = self.bot.get_guild(Guild.guild_id)
+            if guild is None:
+                log.warning("Not in the guild, not updating role menus")
+                return
+
+            # Members toggling roles go first.
+            with priority(BACKGROUND):
+                for kind in MENU_KINDS:
+                    try:
+                        await self._sync(guild, kind)
+                    except Exception:  # Keep updating the other kinds and later
+                        log.exception(f"Could not update the {kind} role menus")
+
+    async def _sync(self, guild: discord.Guild, kind: str) -> None:
+        """
+        Bring the menus of a kind in line with the roles they should offer.
+
+        Options of roles that are gone are removed along with their reactions,
+        and new roles go to the first menu message with a free emoji. If all of
+        them are full, another message is posted after the last one.
+        """
+        async with self._sync_lock:
+            self._forget_orphans(kind)
+            role_ids = self._role_ids(kind)
+            menus = self._menus_of(kind)
+            if role_ids is None or not menus:
+                return
+
+            changed = await self._remove_options(menus, set(role_ids))
+            added = await self._add_options(guild, menus, role_ids)
+            changed.update(menu for menu, _ in added)
+
+            for menu in changed:
+                await self._message(menu).edit(content=menu.content(guild))
+            for menu, emoji in added:
+                await self._message(menu).add_reaction(emoji)
+
+            if changed:
+                self._save()
+                log.info(f"Updated {len(changed)} {kind} role menus")
+
+    async def _remove_options(
+        self, menus: "list[RoleMenu]", role_ids: "set[int]"
+    ) -> "set[RoleMenu]":
+        """Remove the options of roles not in `role_ids`, returning changed menus."""
+        changed = set()
+        for menu in menus:
+            for emoji, role_id in list(menu.options.items()):
+                if role_id not in role_ids:
+                    del menu.options[emoji]
+                    await self._message(menu).clear_reaction(emoji)
+                    changed.add(menu)
+        return changed
+
+    async def _add_options(
+        self, guild: discord.Guild, menus: "list[RoleMenu]", role_ids: "list[int]"
+    ) -> "list[tuple[RoleMenu, str]]":
+        """Add options for roles not offered yet, returning their menus and emojis."""
+        offered = {role_id for menu in menus for role_id in menu.options.values()}
+        added = []
+        for role_id in role_ids:
+            if role_id in offered:
+                continue
+            menu = next((menu for menu in menus if menu.free_emojis), None)
+            if menu is None:
+                channel = guild.get_channel(menus[-1].channel_id)
+                menu = await self._post(channel, menus[-1].kind)
+                menus.append(menu)
+            emoji = menu.free_emojis[0]
+            menu.options[emoji] = role_id
+            added.append((menu, emoji))
+        return added
+
+    def _forget_orphans(self, kind: str) -> None:
+        """Forget the menus of a kind whose channel was deleted."""
+        orphans = [
+            menu
+            for menu in self._menus_of(kind)
+            if self.bot.get_channel(menu.channel_id) is None
+        ]
+        for menu in orphans:
+            del self._menus[menu.message_id]
+            log.info(f"Channel of {kind} role menu {menu.message_id} is gone")
+        if orphans:
+            self._save()
+
+    def _message(self, menu: RoleMenu) -> discord.PartialMessage:
+        """Return the message of a menu, whose channel must still exist."""
+        return self.bot.get_channel(menu.channel_id).get_partial_message(
+            menu.message_id
+        )
+
+    async def _post(self, channel: discord.TextChannel, kind: str) -> RoleMenu:
+        """Post an empty menu message, to be filled in by `_sync`."""
+        message = await channel.send(f"**{MENU_TITLES[kind]}**")
+        menu = RoleMenu(kind, channel.id, message.id)
+        self._menus[message.id] = menu
+        self._save()
+        log.info(f"Posted a {kind} role menu in {channel}")
+        return menu
+
+    @commands.Cog.listener()
+    async def on_announcement_roles_update(self) -> None:
+        """Update the announcement menus."""
+        self._schedule_sync()
+
+    @commands.Cog.listener()
+    async def on_config_reload(self) -> None:
+        """Update the menus, as the class or pronoun roles may have changed."""
+        self._schedule_sync()
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        """Forget the menus in deleted channels."""
+        for kind in MENU_KINDS:
+            self._forget_orphans(kind)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(
+        self, payload: discord.RawMessageDeleteEvent
+    ) -> None:
+        """Forget menus whose message was deleted."""
+        if self._menus.pop(payload.message_id, None) is not None:
+            log.info(f"Role menu message {payload.message_id} was deleted")
+            self._save()
+
+    def _option(
+        self, payload: discord.RawReactionActionEvent
+    ) -> "typing.Optional[tuple[RoleMenu, int]]":
+        """Return the menu and role a reaction is for, if it's for one."""
+        menu = self._menus.get(payload.message_id)
+        if menu is None or payload.user_id == self.bot.user.id:
+            return None
+        role_id = menu.options.get(str(payload.emoji))
+        if role_id is None:
+            return None
+        return menu, role_id
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(
+        self, payload: discord.RawReactionActionEvent
+    ) -> None:
+        """Give members the role they reacted with."""
+        option = self._option(payload)
+        if option is None:
+            return
+        menu, role_id = option
+
+        if menu.kind == "class":
+            await self._give_class_role(menu, payload, role_id)
+            return
+
+        await self.bot.http.add_role(
+            payload.guild_id, payload.user_id, role_id, reason=f"{menu.kind} role menu"
+        )
+        registry.counter("role_menu_toggles_total", kind=menu.kind, action="add").inc()
+        log.info(f"Gave {payload.member} role {role_id} from the {menu.kind} menu")
+
+    async def _give_class_role(
+        self, menu: RoleMenu, payload: discord.RawReactionActionEvent, role_id: int
+    ) -> None:
+        """Give a member a class role, unless they already have one."""
+        member = payload.member
+        # Changing classes is up to moderators, like with the commands. Two quick
+        # reactions both have payloads without a class role, so members being
+        # given one are denied as well.
+        if member.id in self._class_grants or role_masks.has_any(member, CLASS_ROLES):
+            await self._message(menu).remove_reaction(
+                payload.emoji, discord.Object(payload.user_id)
+            )
+            registry.counter(
+                "role_menu_toggles_total", kind=menu.kind, action="denied"
+            ).inc()
+            return
+
+        self._class_grants.add(member.id)
+        try:
+            # Only adds the role, so other role changes in flight aren't undone.
+            await self.bot.http.add_role(
+                payload.guild_id, member.id, role_id, reason="class role menu"
+            )
+        finally:
+            asyncio.get_event_loop().call_later(
+                CLASS_GRANT_GRACE, self._class_grants.discard, member.id
+            )
+        registry.counter("role_menu_toggles_total", kind=menu.kind, action="add").inc()
+        log.info(f"Gave {member} class role {role_id} from the class menu")
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(
+        self, payload: discord.RawReactionActionEvent
+    ) -> None:
+        """Take away the role members removed their reaction for."""
+        option = self._option(payload)
+        if option is None:
+            return
+        menu, role_id = option
+        if menu.kind == "class":
+            return
+
+        await self.bot.http.remove_role(
+            payload.guild_id, payload.user_id, role_id, reason=f"{menu.kind} role menu"
+        )
+        registry.counter(
+            "role_menu_toggles_total", kind=menu.kind, action="remove"
+        ).inc()
+        log.info(
+            f"Took role {role_id} from member {payload.user_id} "
+            + f"from the {menu.kind} menu"
+        )
+
+    @commands.guild_only()
+    @has_any_role_in(ADMIN_ROLES)
+    @commands.group(
+        name="role-menus", aliases=("rolemenus", "menus"), invoke_without_command=True
+    )
+    async def role_menus_group(self, ctx: commands.Context) -> None:
+        """Commands group for managing the role menus."""
+        await ctx.send_help(ctx.command)
+
+    @commands.guild_only()
+    @has_any_role_in(ADMIN_ROLES)
+    @role_menus_group.command(name="post", aliases=("p", "add"))
+    async def post_menu(
+        self,
+        ctx: commands.Context,
+        kind: str,
+        channel: typing.Optional[discord.TextChannel] = None,
+    ) -> None:
+        """Post a role menu (`class`, `pronouns` or `announcements`) in #roles."""
+        kind = kind.lower()
+        if kind not in MENU_KINDS:
+            await ctx.send(
+                f"{Emoji.no} There are {', '.join(MENU_KINDS)} role menus, "
+                + f"not `{kind}`."
+            )
+            return
+        if self._menus_of(kind):
+            await ctx.send(f"{Emoji.no} There already is a {kind} role menu.")
+            return
+
+        channel = channel or ctx.guild.get_channel(Channels.roles)
+        if channel is None:
+            await ctx.send(f"{Emoji.no} Could not find #roles, name a channel.")
+            return
+        await self._post(channel, kind)
+        with priority(BACKGROUND):
+            await self._sync(ctx.guild, kind)
+        await ctx.send(f"{Emoji.ok} Posted the {kind} role menu in {channel.mention}!")
+
+    @commands.guild_only()
+    @has_any_role_in(ADMIN_ROLES)
+    @role_menus_group.command(name="remove", aliases=("rm",))
+    async def remove_menu(self, ctx: commands.Context, kind: str) -> None:
+        """Delete the messages of a role menu."""
+        kind = kind.lower()
+        menus = self._menus_of(kind)
+        if not menus:
+            await ctx.send(f"{Emoji.no} There is no {kind} role menu.")
+            return
+
+        for menu in menus:
+            del self._menus[menu.message_id]
+            try:
+                await self._message(menu).delete()
+            except discord.NotFound:
+                pass
+        self._save()
+        log.info(f"Removed the {kind} role menu at the request of {ctx.author}")
+        await ctx.send(f"{Emoji.ok} Removed the {kind} role menu!")
+
+
+def setup(bot: commands.Bot) -> None:
+    """Add the RoleMenus cog to the bot."""
+    bot.add_cog(RoleMenus(bot))
@@ -6,9 +6,13 @@
 from discord.ext import commands
 from discord.ext.commands.errors import CommandError, MissingAnyRole, NoPrivateMessage
 
+from roycemorebot.checks import has_any_role_in
 from roycemorebot.constants import BOT_ADMINS, Channels, Emoji
+from roycemorebot.members import store as member_store
+from roycemorebot.metrics import Histogram, peak_rss, registry, rss
 
 PRECISION = 3
+MIB = 1024 * 1024
 
 log = logging.getLogger(__name__)
 
@@ -41,6 +45,111 @@ async def ping(self, ctx: commands.Context) -> None:
 
         await ctx.send(embed=embed)
 
+    @staticmethod
+    def _format_percentiles(histogram: Histogram) -> str:
+        """Format the p50, p95 and p99 of a latency histogram in milliseconds."""
+        return " / ".join(
+            f"{histogram.percentile(percent) * 1000:.0f}" for percent in (50, 95, 99)
+        )
+
+    @has_any_role_in(BOT_ADMINS)
+    @commands.command(aliases=("metrics",))
+    async def stats(self, ctx: commands.Context) -> None:
+        """View command and listener latencies and HTTP request counts."""
+        embed = Embed(
+            title="Stats",
+            description="Latencies are p50 / p95 / p99 in ms.",
+            colour=Colour.blurple(),
+        )
+
+        errors = registry.counters.get("command_errors_total", {})
+        command_lines = []
+        for labels, histogram in sorted(
+            registry.histograms.get("command_duration_seconds", {}).items(),
+            key=lambda item: -item[1].count,
+        ):
+            error_count = errors[labels].value if labels in errors else 0
+            command_lines.append(
+                f"`{dict(labels)['command']}`: {histogram.count} runs, "
+                + f"{error_count} errors, {self._format_percentiles(histogram)}"
+            )
+        embed.add_field(
+            name="Commands",
+            value="\n".join(command_lines)[:1024] or "None yet.",
+            inline=False,
+        )
+
+        listener_lines = [
+            f"`{dict(labels)['listener']}`: {histogram.count} runs, "
+            + self._format_percentiles(histogram)
+            for labels, histogram in sorted(
+                registry.histograms.get("listener_duration_seconds", {}).items(),
+                key=lambda item: -item[1].count,
+            )
+        ]
+        embed.add_field(
+            name="Listeners",
+            value="\n".join(listener_lines)[:1024] or "None yet.",
+            inline=False,
+        )
+
+        http_total = sum(
+            counter.value
+            for counter in registry.counters.get("http_requests_total", {}).values()
+        )
+        rate_limits = sum(
+            counter.value
+            for counter in registry.counters.get("rate_limits_total", {}).values()
+        )
+        embed.add_field(name="HTTP requests", value=str(http_total), inline=True)
+        embed.add_field(name="Rate limits hit", value=str(rate_limits), inline=True)
+
+        welcomes = registry.counters.get("welcome_messages_total", {})
+        if welcomes:
+            embed.add_field(
+                name="Welcome messages",
+                value=", ".join(
+                    f"{counter.value} {dict(labels)['result']}"
+                    for labels, counter in sorted(welcomes.items())
+                ),
+                inline=False,
+            )
+
+        await ctx.send(embed=embed)
+
+    @has_any_role_in(BOT_ADMINS)
+    @commands.command(aliases=("mem",))
+    async def memory(self, ctx: commands.Context) -> None:
+        """View how much memory the bot uses, and what it keeps cached."""
+        embed = Embed(
+            title="Memory",
+            description=f"Cache profile: `{self.bot.cache_profile}`",
+            colour=Colour.blurple(),
+        )
+        embed.add_field(name="RSS", value=f"{rss() / MIB:.1f} MiB", inline=True)
+        embed.add_field(
+            name="Peak RSS", value=f"{peak_rss() / MIB:.1f} MiB", inline=True
+        )
+
+        member_count = sum(guild.member_count or 0 for guild in self.bot.guilds)
+        cached_members = sum(len(guild.members) for guild in self.bot.guilds)
+        embed.add_field(
+            name="Members",
+            value=f"{cached_members} of {member_count} cached\n"
+            + f"{len(member_store)} stored "
+            + f"({member_store.memory_usage() / 1024:.0f} KiB)",
+            inline=False,
+        )
+        embed.add_field(name="Users", value=str(len(self.bot.users)), inline=True)
+        embed.add_field(
+            name="Messages",
+            value=f"{len(self.bot.cached_messages)} of "
+            + f"{self.bot._connection.max_messages or 0} cached",
+            inline=True,
+        )
+
+        await ctx.send(embed=embed)
+
     @commands.command(aliases=("ut",))
     async def uptime(self, ctx: commands.Context) -> None:
         """View the uptime of the bot."""
@@ -56,7 +165,7 @@ async def uptime(self, ctx: commands.Context) -> None:
         )
 
     @commands.guild_only()
-    @commands.has_any_role(*BOT_ADMINS)
+    @has_any_role_in(BOT_ADMINS)
     @commands.command(aliases=("reboot",))
     async def restart(self, ctx: commands.Context, delay: int = 0) -> None:
         """Restart the bot after a certain delay (in seconds)."""
@@ -1,5 +1,3 @@
-import asyncio
-import json
 import logging
 import typing
 from pathlib import Path
@@ -7,19 +5,27 @@
 import discord
 from discord.ext import commands
 
-from fuzzywuzzy import process
-
+from roycemorebot.checks import has_any_role_in
+from roycemorebot.clubs import ClubProvisioning
 from roycemorebot.constants import (
+    ADMIN_ROLES,
     Categories,
     Channels,
     Emoji,
     Guild,
     MOD_ROLES,
-    StaffRoles,
 )
+from roycemorebot.deletions import send_but_delete_in_roles
+from roycemorebot.matching import AnnouncementMatcher, RoleNameIndex
+from roycemorebot.persistence import JSONStore
+from roycemorebot.roles import RoleTransaction
 
 log = logging.getLogger(__name__)
 
+ANNOUNCEMENT_ROLES_STORE = JSONStore(Path("data", "announcement_roles.json"))
+# Announcement roles that aren't for a club channel.
+NON_CLUB_ANNOUNCEMENTS = ("server", "event")
+
 
 class Subscriptions(commands.Cog):
     """User-assigned subscriptions to select announcements."""
@@ -27,65 +33,159 @@ class Subscriptions(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self._announcement_roles = self.load_announcement_roles()
+        self._role_indexes = {}  # guild ID -> RoleNameIndex
 
-    @commands.Cog.listener()
-    async def on_ready(self) -> None:
-        """Load the announcement roles, but only once guilds are available."""
-        if self._announcement_roles != {}:
+    @property
+    def announcement_roles(
+        self,
+    ) -> "typing.Mapping[str, dict[str, typing.Union[int, bool]]]":
+        """The announcement roles, by their names. Don't change them."""
+        return self._roles
+
+    @property
+    def _announcement_roles(self) -> "dict[str, dict[str, typing.Union[int, bool]]]":
+        """The announcement roles, by their names."""
+        return self._roles
+
+    @_announcement_roles.setter
+    def _announcement_roles(
+        self, roles: "dict[str, dict[str, typing.Union[int, bool]]]"
+    ) -> None:
+        """Set the announcement roles, and rebuild the matcher and menus for them."""
+        self._roles = roles
+        self._matcher = AnnouncementMatcher(roles)
+        self.bot.dispatch("announcement_roles_update")
+
+    def _update_announcement_role(
+        self, name: str, info: "typing.Optional[dict[str, typing.Union[int, bool]]]"
+    ) -> None:
+        """Add, change or (with no info) remove an announcement role, and save."""
+        if self._announcement_roles.get(name) == info:
             return
 
-        log.info("No announcement roles found, requesting to reload")
-        mod_bot_channel = self.bot.get_channel(Channels.mod_bot_commands)
-        guild = discord.utils.get(self.bot.guilds, id=Guild.guild_id)
-        mod_role = discord.utils.get(guild.roles, id=StaffRoles.mod_role)
-        msg = await mod_bot_channel.send(
-            f"{mod_role.mention}\nNo announcement roles are loaded. Reload?"
+        # Copied, so the old matcher isn't left with a changed map.
+        roles = dict(self._announcement_roles)
+        if info is None:
+            roles.pop(name, None)
+        else:
+            roles[name] = info
+        self._announcement_roles = roles
+        ANNOUNCEMENT_ROLES_STORE.save(roles)
+        log.info(f"Updated announcement role `{name}`: {info}")
+
+    @staticmethod
+    def _is_club_channel(channel: discord.abc.GuildChannel) -> bool:
+        """Return whether a channel is a club channel."""
+        return (
+            isinstance(channel, discord.TextChannel)
+            and channel.guild.id == Guild.guild_id
+            and channel.category_id == Categories.clubs
         )
 
-        await msg.add_reaction("✅")
-        await msg.add_reaction("❌")
+    def _role_index(self, guild: discord.Guild) -> RoleNameIndex:
+        """Return the role name index of a guild, building it the first time."""
+        index = self._role_indexes.get(guild.id)
+        if index is None:
+            index = self._role_indexes[guild.id] = RoleNameIndex(guild.roles)
+        return index
+
+    def _sync_announcement_role(self, guild: discord.Guild, name: str) -> None:
+        """Update the announcement role of a name from the guild's roles."""
+        if name in NON_CLUB_ANNOUNCEMENTS or any(
+            self._is_club_channel(channel) and channel.name == name
+            for channel in guild.text_channels
+        ):
+            role = self._role_index(guild).announcement_role(name)
+        else:
+            role = None
 
-        try:
-            reaction, user = await self.bot.wait_for(
-                "reaction_add",
-                timeout=300.0,
-                check=lambda r, u: str(r.emoji) in ["✅", "❌"]
-                and r.message == msg
-                and not u.bot,
-            )
-        except asyncio.TimeoutError:
-            log.info("Reload timed out")
-            await mod_bot_channel.send(
-                "Announcement role reload timeout. Use `?subscriptions reload` "
-                + "to reload the announcement roles."
-            )
+        if role is None:
+            self._update_announcement_role(name, None)
         else:
-            if str(reaction.emoji) == "✅":
-                log.info(f"Announcement role reload started by {user}")
-                self._announcement_roles = self.reload_announcement_roles()
-                await mod_bot_channel.send(
-                    f"{Emoji.ok} Successfully reloaded announcement roles!"
-                )
-            else:
-                log.info(f"Announcement role reload canceled by {user}")
-                await mod_bot_channel.send(
-                    f"{Emoji.no} Announcement role reload canceled. Use "
-                    + "`?subscriptions reload` to reload the announcement roles."
-                )
+            self._update_announcement_role(
+                name, {"id": role.id, "club": "club" in role.name.lower()}
+            )
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        """Add new announcement roles."""
+        if role.guild.id != Guild.guild_id:
+            return
+        self._role_index(role.guild).add(role)
+        self._sync_announcement_role(role.guild, RoleNameIndex.slug(role.name))
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(
+        self, before: discord.Role, after: discord.Role
+    ) -> None:
+        """Update announcement roles that were renamed."""
+        if after.guild.id != Guild.guild_id or before.name == after.name:
+            return
+        index = self._role_index(after.guild)
+        index.remove(before.id, before.name)
+        index.add(after)
+        for name in {RoleNameIndex.slug(before.name), RoleNameIndex.slug(after.name)}:
+            self._sync_announcement_role(after.guild, name)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        """Remove deleted announcement roles, or replace them if there's another."""
+        if role.guild.id != Guild.guild_id:
+            return
+        self._role_index(role.guild).remove(role.id, role.name)
+        for name, info in list(self._announcement_roles.items()):
+            if info["id"] == role.id:
+                self._sync_announcement_role(role.guild, name)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        """Add the announcement roles of new club channels."""
+        if self._is_club_channel(channel):
+            self._sync_announcement_role(channel.guild, channel.name)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ) -> None:
+        """Update the announcement roles of club channels that were renamed or moved."""
+        if (before.name, before.category_id) == (after.name, after.category_id):
+            return
+        if self._is_club_channel(before):
+            self._sync_announcement_role(before.guild, before.name)
+        if self._is_club_channel(after):
+            self._sync_announcement_role(after.guild, after.name)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        """Remove the announcement roles of deleted club channels."""
+        if self._is_club_channel(channel):
+            self._sync_announcement_role(channel.guild, channel.name)
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        """Catch up on announcement role changes made while the bot was offline."""
+        # A new session has new role objects, so the indexes are rebuilt. This
+        # runs again whenever the bot reconnects without resuming, as the events
+        # missed while it was disconnected aren't sent.
+        self._role_indexes.clear()
+        if self.bot.get_guild(Guild.guild_id) is None:
+            log.warning("Not in the guild, not reloading announcement roles")
+            return
+
+        roles = self.reload_announcement_roles()
+        if roles != self._announcement_roles:
+            log.info("Announcement roles changed since they were saved")
+        self._announcement_roles = roles
 
     @staticmethod
     def load_announcement_roles() -> "dict[str, dict[str, typing.Union[int, bool]]]":
         """Load all the announcement roles from the save file."""
-        save_file = Path("data", "announcement_roles.json")
-
-        if save_file.is_file():
+        # Cogs are loaded before the bot connects, so blocking here is fine.
+        roles = ANNOUNCEMENT_ROLES_STORE.load(default={})
+        if roles:
             log.info("Loaded announcement roles from save file")
-            with save_file.open("r") as f:
-                roles = json.load(f)
-                log.trace(f"File contents: {roles}")
-                return roles
-        else:
-            return {}  # Checked later in `on_ready` and loaded from guild.
+            log.trace("File contents: %s", roles)
+        return roles  # Brought up to date with the guild in `on_ready`.
 
     def reload_announcement_roles(
         self,
@@ -97,133 +197,103 @@ def reload_announcement_roles(
         clubs_category = discord.utils.get(guild.categories, id=Categories.clubs)
 
         log.trace("Starting role reload.")
+        # Built from scratch, in case the index missed something.
+        role_index = self._role_indexes[guild.id] = RoleNameIndex(guild.roles)
+
         # Get server and event announcements seperately
-        announcement_roles["server"] = {
-            "id": discord.utils.get(guild.roles, name="Server Announcements").id,
-            "club": False,
-        }
-        announcement_roles["event"] = {
-            "id": discord.utils.get(guild.roles, name="Event Announcements").id,
-            "club": False,
-        }
+        for name in NON_CLUB_ANNOUNCEMENTS:
+            announcement_roles[name] = {
+                "id": role_index.announcement_role(name).id,
+                "club": False,
+            }
 
         for channel in clubs_category.channels:
-            announcement_role = discord.utils.find(
-                lambda role: "Announcements" in role.name
-                and role.name.lower().startswith(channel.name)
-                and role.name.index(" ") == len(channel.name),  # prevents overlap
-                guild.roles,
-            )
-            log.trace(f"Channel: {channel.name}, role: {announcement_role}")
+            announcement_role = role_index.announcement_role(channel.name)
+            log.trace("Channel: %s, role: %s", channel.name, announcement_role)
+            if announcement_role is None:
+                log.warning(f"No announcement role found for channel {channel.name}")
+                continue
+
             announcement_roles[channel.name] = {
                 "id": announcement_role.id,
                 "club": "club" in announcement_role.name.lower(),
             }
 
         log.trace("Saving announcement roles.")
-        save_file = Path("data", "announcement_roles.json")
-        save_file.parent.mkdir(exist_ok=True)
-        with save_file.open("w") as f:
-            json.dump(announcement_roles, f, indent=2)
+        ANNOUNCEMENT_ROLES_STORE.save(announcement_roles)
 
         log.info("Announcement role reload finished")
         return announcement_roles
 
-    @commands.guild_only()
-    @commands.command(aliases=("sub",))
-    async def subscribe(self, ctx: commands.Context, announcement_name: str) -> None:
-        """Subscribe to an announcement role on the server."""
-        all_roles = list(self._announcement_roles.keys())
-        log.trace(f"All roles: {all_roles}")
-        match_info = process.extractOne(
-            announcement_name,
-            all_roles,
-            score_cutoff=75,
-        )
-        log.trace(f"Match info: {match_info}")
+    async def _change_subscriptions(
+        self, ctx: commands.Context, announcement_names: "tuple[str, ...]", add: bool
+    ) -> None:
+        """Subscribe to or unsubscribe from announcements with a single role edit."""
         author_ping = ctx.author.mention
-        if match_info:
-            role = discord.utils.get(
-                ctx.guild.roles, id=self._announcement_roles[match_info[0]]["id"]
+        if not announcement_names:
+            await send_but_delete_in_roles(
+                ctx, f"{author_ping}, please name at least one announcement role."
             )
-            log.trace(f"Matched role `{role}` with probability {match_info[1]}")
-            await ctx.author.add_roles(
-                role,
-                reason="User announcements subscription",
-            )
-            log.info(f"User {ctx.author} subscribed to {role}")
-
-            if ctx.message.channel.id == Channels.roles:
-                await ctx.send(
-                    f"{author_ping}, you have successfully subscribed to {role}.",
-                    delete_after=5.0,
-                )
-                await asyncio.sleep(5.0)
-                await ctx.message.delete()
-            else:
-                await ctx.send(
-                    f"{author_ping}, you have successfully subscribed to {role}.",
-                )
+            return
+
+        names, unmatched = self._matcher.match_all(announcement_names)
+        roles = [
+            ctx.guild.get_role(self._announcement_roles[name]["id"]) for name in names
+        ]
+        roles = [role for role in roles if role is not None]
+
+        transaction = RoleTransaction(ctx.author)
+        current_roles = transaction.current_roles
+        if add:
+            transaction.add(*roles)
+        else:
+            transaction.remove(*roles)
+        changed = [role for role in roles if (role.id in current_roles) != add]
+        await transaction.commit(
+            reason=f"User announcements {'' if add else 'un'}subscription"
+        )
+
+        verb = "subscribed to" if add else "unsubscribed from"
+        if changed:
+            log.info(f"User {ctx.author} {verb} {_join(changed)}")
+            lines = [f"{author_ping}, you have successfully {verb} {_join(changed)}."]
+        elif roles:
+            state = "already subscribed to" if add else "not subscribed to"
+            lines = [f"{author_ping}, you were {state} {_join(roles)}."]
         else:
-            if ctx.message.channel.id == Channels.roles:
-                await ctx.send(
-                    f"{author_ping}, there are no announcement roles with that name.",
-                    delete_after=5.0,
-                )
-                await asyncio.sleep(5.0)
-                await ctx.message.delete()
-            else:
-                await ctx.send(
-                    f"{author_ping}, there are no announcement roles with that name."
-                )
+            lines = [f"{author_ping}, there are no announcement roles with that name."]
+        if unmatched and roles:
+            lines.append(
+                "There are no announcement roles named "
+                + f"{_join(f'`{name}`' for name in unmatched)}."
+            )
+        await send_but_delete_in_roles(ctx, "\n".join(lines))
+
+    @commands.guild_only()
+    @commands.command(aliases=("sub",))
+    async def subscribe(self, ctx: commands.Context, *announcement_names: str) -> None:
+        """
+        Subscribe to announcement roles on the server.
+
+        Name as many as you like, or `all` or `clubs` for every announcement role
+        or every club's. Quote names of more than one word to be sure they're
+        matched as a whole, like `"student council"`.
+        """
+        await self._change_subscriptions(ctx, announcement_names, add=True)
 
     @commands.guild_only()
     @commands.command(aliases=("unsub",))
-    async def unsubscribe(self, ctx: commands.Context, announcement_name: str) -> None:
-        """Unsubscribe to an announcement role on the server."""
-        all_roles = list(self._announcement_roles.keys())
-        log.trace(f"All roles: {all_roles}")
-        match_info = process.extractOne(
-            announcement_name,
-            all_roles,
-            score_cutoff=75,
-        )
-        log.trace(f"Match info: {match_info}")
-        author_ping = ctx.author.mention
-        if match_info:
-            role = discord.utils.get(
-                ctx.guild.roles, id=self._announcement_roles[match_info[0]]["id"]
-            )
-            log.trace(f"Matched role `{role}` with probability {match_info[1]}")
-            await ctx.author.remove_roles(
-                role,
-                reason="User announcements unsubscription",
-            )
-            log.info(f"User {ctx.author} unsubscribed from {role}")
-
-            if ctx.message.channel.id == Channels.roles:
-                await ctx.send(
-                    f"{author_ping}, you have successfully unsubscribed from {role}.",
-                    delete_after=5.0,
-                )
-                await asyncio.sleep(5.0)
-                await ctx.message.delete()
-            else:
-                await ctx.send(
-                    f"{author_ping}, you have successfully unsubscribed from {role}.",
-                )
-        else:
-            if ctx.message.channel.id == Channels.roles:
-                await ctx.send(
-                    f"{author_ping}, there are no announcement roles with that name.",
-                    delete_after=5.0,
-                )
-                await asyncio.sleep(5.0)
-                await ctx.message.delete()
-            else:
-                await ctx.send(
-                    f"{author_ping}, there are no announcement roles with that name."
-                )
+    async def unsubscribe(
+        self, ctx: commands.Context, *announcement_names: str
+    ) -> None:
+        """
+        Unsubscribe from announcement roles on the server.
+
+        Name as many as you like, or `all` or `clubs` for every announcement role
+        or every club's. Quote names of more than one word to be sure they're
+        matched as a whole, like `"student council"`.
+        """
+        await self._change_subscriptions(ctx, announcement_names, add=False)
 
     @commands.guild_only()
     @commands.group(
@@ -254,17 +324,15 @@ async def list_subscriptions(self, ctx: commands.Context) -> None:
             )
 
         if ctx.channel.id == Channels.roles:
-            await ctx.send(
+            await send_but_delete_in_roles(
+                ctx,
                 f"{ctx.author.mention}, please use a bot channel to run that command.",
-                delete_after=5.0,
             )
-            await asyncio.sleep(5.0)
-            await ctx.message.delete()
         else:
             await ctx.send(embed=embed)
 
     @commands.guild_only()
-    @commands.has_any_role(*MOD_ROLES)
+    @has_any_role_in(MOD_ROLES)
     @subscriptions_group.command(aliases=("r",))
     async def reload(self, ctx: commands.Context) -> None:
         """Reload the announcement roles save."""
@@ -272,7 +340,7 @@ async def reload(self, ctx: commands.Context) -> None:
         await ctx.send(f"{Emoji.ok} Successfully reloaded announcement roles!")
 
     @commands.guild_only()
-    @commands.has_role(StaffRoles.admin_role)
+    @has_any_role_in(ADMIN_ROLES)
     @subscriptions_group.command(name="add-club", aliases=("add", "ac", "a-c", "a"))
     async def add_club(
         self,
@@ -297,64 +365,27 @@ async def add_club(
             + f"leader title: {leader_title}"
         )
 
-        # Create the roles and assign them
-        leader_role = await guild.create_role(
-            name=f"{name.title()}{' Club' if club else ''} {leader_title}",
-            mentionable=True,
-            reason="Club creation",
-        )
-        ann_role = await guild.create_role(
-            name=f"{name.title()}{' Club' if club else ''} Announcements",
-            mentionable=True,
-            reason="Club creation",
-        )
-        log.trace(f"Created {leader_role} and {ann_role} role")
-
-        if leaders:
-            for leader in leaders:
-                await leader.add_roles(leader_role, reason="Club creation")
-        log.trace("Assigned leaders their roles")
+        provisioning = ClubProvisioning(guild, name, leaders or (), club, leader_title)
+        try:
+            await provisioning.run()
+        except discord.HTTPException as e:
+            await ctx.send(
+                f"{Emoji.no} Could not add the club channel, so nothing was added: {e}"
+            )
+            return
 
-        # Create the channel
-        clubs_category = discord.utils.get(guild.categories, id=Categories.clubs)
-        channel = await clubs_category.create_text_channel(
-            name,
-            overwrites={
-                discord.utils.get(
-                    guild.roles, id=StaffRoles.mod_role
-                ): discord.PermissionOverwrite(view_channel=True, send_messages=True),
-                discord.utils.get(
-                    guild.roles, id=StaffRoles.muted_role
-                ): discord.PermissionOverwrite(send_messages=False),
-                leader_role: discord.PermissionOverwrite(
-                    view_channel=True,
-                    manage_channels=True,
-                    manage_permissions=True,
-                    send_messages=True,
-                    manage_messages=True,
-                ),
-            },
-            reason="Club creation",
-        )
-        position = sorted(
-            clubs_category.text_channels, key=lambda channel: channel.name
-        ).index(channel)
-        log.trace(f"Channel index: {position}")
-        await channel.edit(position=position, reason="Club creation")
-        log.trace(f"Created channel {channel} and moved to postition {position}")
-
-        # Load new announcement roles
-        log.info(
-            "Reloading announcement roles because of new announcement channel "
-            + channel_name
+        # Only the new club's announcement role changed, so no need to reload.
+        role = provisioning.announcement_role
+        self._update_announcement_role(
+            provisioning.channel.name,
+            {"id": role.id, "club": "club" in role.name.lower()},
         )
-        self._announcement_roles = self.reload_announcement_roles()
 
         # Completion message
         await ctx.send(f"{Emoji.ok} Successfully added club channel!")
 
     @commands.guild_only()
-    @commands.has_role(StaffRoles.admin_role)
+    @has_any_role_in(ADMIN_ROLES)
     @subscriptions_group.command(
         name="remove-club", aliases=("remove", "rm-c", "rmc", "rm")
     )
@@ -366,26 +397,30 @@ async def remove_club(
             f"Deleteing club channel {club_channel} and roles at the request of "
             + f"{ctx.author}"
         )
-        ann_role = discord.utils.get(
-            ctx.guild.roles, id=self._announcement_roles[club_channel.name]["id"]
-        )
+        ann_role = ctx.guild.get_role(self._announcement_roles[club_channel.name]["id"])
+        leader_role = self._role_index(ctx.guild).leader_role(club_channel.name)
+
         await ann_role.delete(reason="Removing club from server")
         log.trace("Deleted announcement role")
-        leader_role = discord.utils.find(
-            lambda role: role.name.lower().startswith(club_channel.name),
-            ctx.guild.roles,
-        )
         await leader_role.delete(reason="Removing club from server")
         log.trace("Deleted leader role")
         await club_channel.delete(reason="Removing club from server")
         log.trace("Deleted channel")
 
-        self._announcement_roles = self.reload_announcement_roles()
+        self._update_announcement_role(club_channel.name, None)
 
         # Completion message
         await ctx.send(f"{Emoji.ok} Successfully removed club channel!")
 
 
+def _join(items: typing.Iterable[typing.Any]) -> str:
+    """Join items into an English list, like `a, b and c`."""
+    items = [str(item) for item in items]
+    if len(items) < 2:
+        return "".join(items)
+    return f"{', '.join(items[:-1])} and {items[-1]}"
+
+
 def setup(bot: commands.Bot) -> None:
     """Add the Subscriptions cog to the bot."""
     bot.add_cog(Subscriptions(bot))
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import math
+import time
+import typing
+
+from aiohttp import web
+
+from discord.ext import commands
+
+from roycemorebot import metrics
+from roycemorebot.constants import Health
+
+log = logging.getLogger(__name__)
+
+LAG_INTERVAL = 0.5  # seconds between event loop lag measurements
+
+
+class HealthServer:
+    """
+    A small HTTP server on localhost for monitoring the bot.
+
+    `/healthz` reports whether the bot is connected to the gateway, how long
+    ago the last heartbeat was acknowledged and how far behind the event loop
+    is, with status 200 if they are all fine and 503 if not. `/metrics` serves
+    the metrics registry in the Prometheus text format.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.loop_lag = 0.0
+        self._runner = None
+        self._lag_task = None
+
+    async def start(self) -> None:
+        """Start measuring the event loop lag and serving requests."""
+        app = web.Application()
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/metrics", self.serve_metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, Health.host, Health.port)
+        try:
+            await site.start()
+        except OSError as e:
+            log.error(f"Could not start the health server: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return
+
+        self._lag_task = asyncio.get_event_loop().create_task(self._measure_lag())
+        log.info(f"Health server listening on http://{Health.host}:{Health.port}")
+
+    async def stop(self) -> None:
+        """Stop the server, if it is running."""
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _measure_lag(self) -> None:
+        """Measure how much later than requested sleeps on the event loop end."""
+        loop = asyncio.get_event_loop()
+        gauge = metrics.registry.gauge("event_loop_lag_seconds")
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.loop_lag = max(0.0, loop.time() - start - LAG_INTERVAL)
+            gauge.set(self.loop_lag)
+
+    def heartbeat_age(self) -> typing.Optional[float]:
+        """
+        Return the seconds since the last heartbeat ack, or None if disconnected.
+
+        discord.py has no public API for this, and listening to every gateway
+        message with `on_socket_response` would schedule a task for each one, so
+        it is read from the gateway's keep-alive thread.
+        """
+        ws = self.bot.ws
+        if ws is None or not ws.open:
+            return None
+        keep_alive = getattr(ws, "_keep_alive", None)  # None while reconnecting
+        if keep_alive is None:
+            return None
+        return time.perf_counter() - keep_alive._last_ack
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        """Report the health of the bot."""
+        heartbeat_age = self.heartbeat_age()
+        connected = (
+            not self.bot.is_closed()
+            and self.bot.is_ready()
+            and heartbeat_age is not None
+        )
+        # The latency is NaN until the first heartbeat is acknowledged.
+        latency = self.bot.latency if connected else math.nan
+        healthy = (
+            connected
+            and heartbeat_age <= Health.max_heartbeat_age
+            and self.loop_lag <= Health.max_loop_lag
+        )
+        return web.json_response(
+            {
+                "status": "ok" if healthy else "unhealthy",
+                "connected": connected,
+                "heartbeat_age": heartbeat_age,
+                "latency": None if math.isnan(latency) else latency,
+                "loop_lag": self.loop_lag,
+            },
+            status=200 if healthy else 503,
+        )
+
+    async def serve_metrics(self, request: web.Request) -> web.Response:
+        """Serve the metrics in the Prometheus text format."""
+        metrics.registry.gauge("gateway_latency_seconds").set(self.bot.latency)
+        metrics.registry.gauge("resident_memory_bytes").set(metrics.rss())
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+DATABASE = Path("data", "infractions.db")
+THREADS = 2  # connections, so a slow write doesn't hold up history lookups
+BUSY_TIMEOUT = 5.0  # seconds to wait for another connection's write to finish
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS infractions (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    moderator_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    reason TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS infractions_by_user ON infractions (user_id, id);
+CREATE INDEX IF NOT EXISTS infractions_by_moderator ON infractions (moderator_id, id);
+CREATE INDEX IF NOT EXISTS infractions_by_created_at ON infractions (created_at);
+"""
+
+# The same SQL strings are reused, so each connection prepares them only once.
+INSERT = """
+INSERT INTO infractions (user_id, moderator_id, kind, reason, created_at)
+VALUES (?, ?, ?, ?, ?)
+"""
+SELECT = "SELECT id, user_id, moderator_id, kind, reason, created_at FROM infractions"
+GET = f"{SELECT} WHERE id = ?"
+BY_USER = f"{SELECT} WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?"
+BY_MODERATOR = f"{SELECT} WHERE moderator_id = ? ORDER BY id DESC LIMIT ? OFFSET ?"
+SINCE = f"{SELECT} WHERE created_at >= ? ORDER BY created_at DESC LIMIT ? OFFSET ?"
+COUNT_BY_USER = "SELECT COUNT(*) FROM infractions WHERE user_id = ?"
+COUNT_BY_MODERATOR = "SELECT COUNT(*) FROM infractions WHERE moderator_id = ?"
+COUNT_SINCE = "SELECT COUNT(*) FROM infractions WHERE created_at >= ?"
+DELETE = "DELETE FROM infractions WHERE id = ?"
+
+
+def _timestamp(when: datetime) -> float:
+    """Return the UNIX timestamp of a naive UTC time."""
+    return (when - datetime(1970, 1, 1)).total_seconds()
+
+
+class Infraction(typing.NamedTuple):
+    """A recorded infraction of a user."""
+
+    id: int  # noqa: A003
+    user_id: int
+    moderator_id: int
+    kind: str  # like "warning" or "note"
+    reason: typing.Optional[str]
+    created_at: datetime  # UTC
+
+    @classmethod
+    def from_row(cls: "type[Infraction]", row: tuple) -> "Infraction":
+        """Create an infraction from a row of the infractions table."""
+        *values, created_at = row
+        return cls(*values, datetime.utcfromtimestamp(created_at))
+
+
+class InfractionStore:
+    """
+    Infractions in a local SQLite database, queried without blocking the loop.
+
+    Queries run in a small thread pool with a connection per thread, opened the
+    first time the thread needs it. The database is in WAL mode, so history
+    lookups aren't blocked by writes. A user's or moderator's history is read
+    from an index on `(user_id, id)` or `(moderator_id, id)`, so it takes the
+    same time however many infractions other users have, and it is returned a
+    page at a time.
+    """
+
+    def __init__(self, path: Path = DATABASE):
+        self.path = Path(path)
+        self._executor = None
+        self._opening = None  # task creating the executor and schema
+        self._local = threading.local()
+        self._connections = []  # of every thread, for closing
+        self._connections_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread, opening it if needed."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Safe in WAL mode, only the last writes might be lost on power loss.
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _migrate(self) -> None:
+        """Create the schema, if the database doesn't have it yet."""
+        connection = self._connection()
+        (version,) = connection.execute("PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            with connection:
+                connection.executescript(SCHEMA)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            log.info(f"Created infractions schema version {SCHEMA_VERSION}")
+
+    async def _open(self) -> None:
+        """Start the thread pool and create the schema."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(THREADS, thread_name_prefix="infractions")
+        try:
+            await asyncio.get_event_loop().run_in_executor(
+                self._executor, self._migrate
+            )
+        except Exception:
+            self._opening = None  # Try again with the next query
+            raise
+
+    async def _run(self, function: typing.Callable, *args: typing.Any) -> typing.Any:
+        """Run a function in the thread pool, opening the database if needed."""
+        loop = asyncio.get_event_loop()
+        if self._opening is None:
+            self._opening = loop.create_task(self._open())
+        await asyncio.shield(self._opening)
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    def _execute(self, sql: str, parameters: tuple) -> "list[tuple]":
+        return self._connection().execute(sql, parameters).fetchall()
+
+    def _write(self, sql: str, parameters: tuple) -> sqlite3.Cursor:
+        connection = self._connection()
+        with connection:
+            return connection.execute(sql, parameters)
+
+    async def add(
+        self,
+        user_id: int,
+        moderator_id: int,
+        kind: str,
+        reason: typing.Optional[str] = None,
+    ) -> Infraction:
+        """Record an infraction, returning it."""
+        created_at = time.time()
+        parameters = (user_id, moderator_id, kind, reason, created_at)
+        cursor = await self._run(self._write, INSERT, parameters)
+        log.trace("Recorded %s infraction %s", kind, cursor.lastrowid)
+        return Infraction.from_row((cursor.lastrowid, *parameters))
+
+    async def get(self, infraction_id: int) -> typing.Optional[Infraction]:
+        """Return an infraction by its ID."""
+        rows = await self._run(self._execute, GET, (infraction_id,))
+        return Infraction.from_row(rows[0]) if rows else None
+
+    async def delete(self, infraction_id: int) -> bool:
+        """Delete an infraction, returning whether it existed."""
+        cursor = await self._run(self._write, DELETE, (infraction_id,))
+        return cursor.rowcount > 0
+
+    async def by_user(
+        self, user_id: int, limit: int, offset: int = 0
+    ) -> "list[Infraction]":
+        """Return a page of a user's infractions, newest first."""
+        rows = await self._run(self._execute, BY_USER, (user_id, limit, offset))
+        return [Infraction.from_row(row) for row in rows]
+
+    async def by_moderator(
+        self, moderator_id: int, limit: int, offset: int = 0
+    ) -> "list[Infraction]":
+        """Return a page of the infractions a moderator gave, newest first."""
+        rows = await self._run(
+            self._execute, BY_MODERATOR, (moderator_id, limit, offset)
+        )
+        return [Infraction.from_row(row) for row in rows]
+
+    async def since(
+        self, when: datetime, limit: int, offset: int = 0
+    ) -> "list[Infraction]":
+        """Return a page of the infractions given since a UTC time, newest first."""
+        rows = await self._run(self._execute, SINCE, (_timestamp(when), limit, offset))
+        return [Infraction.from_row(row) for row in rows]
+
+    async def count_by_user(self, user_id: int) -> int:
+        """Return how many infractions a user has."""
+        rows = await self._run(self._execute, COUNT_BY_USER, (user_id,))
+        return rows[0][0]
+
+    async def count_by_moderator(self, moderator_id: int) -> int:
+        """Return how many infractions a moderator gave."""
+        rows = await self._run(self._execute, COUNT_BY_MODERATOR, (moderator_id,))
+        return rows[0][0]
+
+    async def count_since(self, when: datetime) -> int:
+        """Return how many infractions were given since a UTC time."""
+        rows = await self._run(self._execute, COUNT_SINCE, (_timestamp(when),))
+        return rows[0][0]
+
+    async def close(self) -> None:
+        """Wait for running queries, then close the database."""
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        self._opening = None
+        await asyncio.get_event_loop().run_in_executor(None, self._close, executor)
+
+    def _close(self, executor: ThreadPoolExecutor) -> None:
+        executor.shutdown(wait=True)
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+        log.trace("Closed the infractions database")
+
+
+store = InfractionStore()
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import time
+import typing
+from pathlib import Path
+
+import discord
+from discord.ext import commands
+
+from roycemorebot.members import ensure_chunked, get_member
+from roycemorebot.persistence import JSONStore
+from roycemorebot.priorities import BACKGROUND, BULK, set_priority
+from roycemorebot.roles import RoleTransaction
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = Path("data", "jobs")
+
+WORKERS = 4
+MAX_RETRIES = 5
+PROGRESS_INTERVAL = 5.0  # seconds between progress message edits and checkpoints
+
+
+class RoleChange(typing.NamedTuple):
+    """A single member's planned role change."""
+
+    member_id: int
+    remove: "tuple[int, ...]"
+    add: "tuple[int, ...]"
+
+
+def _format_duration(seconds: float) -> str:
+    """Format a duration in seconds as a short human readable string."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    elif minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+class BulkRoleJob:
+    """
+    Apply a precomputed plan of role changes to many members.
+
+    Each member's change is applied with a single role-set edit by a bounded pool
+    of workers. Progress is checkpointed to `data/jobs/<name>.json` so that a job
+    interrupted by a restart can be resumed with `BulkRoleJob.load`, and a live
+    progress message is kept up to date in the channel the job was started from.
+    """
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        name: str,
+        guild_id: int,
+        channel_id: int,
+        changes: "list[RoleChange]",
+        reason: str,
+        total: typing.Optional[int] = None,
+        failed: "typing.Optional[list[int]]" = None,
+    ):
+        self.bot = bot
+        self.name = name
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.reason = reason
+
+        self.total = total if total is not None else len(changes)
+        self.failed = failed or []
+        self._pending = {change.member_id: change for change in changes}
+        self._started = None
+        self._done_this_run = 0
+        self._checkpoint = self._checkpoint_store(name)
+
+    @staticmethod
+    def _checkpoint_store(name: str) -> JSONStore:
+        """Return the store of a job's checkpoint."""
+        return JSONStore(CHECKPOINT_DIR / f"{name}.json", debounce=0.0, backups=1)
+
+    @property
+    def done(self) -> int:
+        """Return the number of changes that have been processed."""
+        return self.total - len(self._pending)
+
+    @classmethod
+    async def load(
+        cls: "type[BulkRoleJob]", bot: commands.Bot, name: str
+    ) -> typing.Optional["BulkRoleJob"]:
+        """Load an interrupted job from its checkpoint, if there is one."""
+        data = await cls._checkpoint_store(name).load_async()
+        if data is None:
+            return None
+        log.info(f"Loaded checkpoint for job `{name}`")
+
+        return cls(
+            bot,
+            name,
+            data["guild_id"],
+            data["channel_id"],
+            [
+                RoleChange(member_id, tuple(remove), tuple(add))
+                for member_id, remove, add in data["pending"]
+            ],
+            data["reason"],
+            total=data["total"],
+            failed=data["failed"],
+        )
+
+    def save_checkpoint(self) -> None:
+        """Save the remaining changes of this job to its checkpoint file."""
+        self._checkpoint.save(
+            {
+                "guild_id": self.guild_id,
+                "channel_id": self.channel_id,
+                "reason": self.reason,
+                "total": self.total,
+                "failed": list(self.failed),
+                "pending": [list(change) for change in self._pending.values()],
+            }
+        )
+
+    async def run(self) -> None:
+        """Run the job until every change has been processed."""
+        guild = self.bot.get_guild(self.guild_id)
+        channel = self.bot.get_channel(self.channel_id)
+        log.info(f"Starting job `{self.name}` with {len(self._pending)} changes left")
+        # Fetching the members one by one would take a request each.
+        await ensure_chunked(guild)
+
+        self.save_checkpoint()
+        self._started = time.monotonic()
+        self._done_this_run = 0
+
+        queue = asyncio.Queue()
+        for change in list(self._pending.values()):
+            queue.put_nowait(change)
+
+        progress_message = await self._send_progress(channel)
+        workers = [
+            asyncio.create_task(self._worker(guild, queue))
+            for _ in range(min(WORKERS, max(queue.qsize(), 1)))
+        ]
+        reporter = asyncio.create_task(self._report_progress(progress_message))
+
+        try:
+            await queue.join()
+        finally:
+            reporter.cancel()
+            for worker in workers:
+                worker.cancel()
+            self.save_checkpoint()
+
+        await self._checkpoint.delete()
+        await self._edit_progress(progress_message, finished=True)
+        log.info(f"Job `{self.name}` finished, {len(self.failed)} changes failed")
+
+    async def _worker(self, guild: discord.Guild, queue: asyncio.Queue) -> None:
+        """Apply changes from the queue until it is cancelled."""
+        set_priority(BULK)
+        while True:
+            change = await queue.get()
+            try:
+                succeeded = await self._apply(guild, change)
+            except Exception:
+                log.exception(f"Error applying {change} in job `{self.name}`")
+                succeeded = False
+
+            if not succeeded:
+                self.failed.append(change.member_id)
+            del self._pending[change.member_id]
+            self._done_this_run += 1
+            queue.task_done()
+
+    async def _apply(self, guild: discord.Guild, change: RoleChange) -> bool:
+        """Apply a single change, returning whether it succeeded."""
+        member = get_member(guild, change.member_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(change.member_id)
+            except discord.NotFound:
+                log.trace("Member %s left, skipping them", change.member_id)
+                return True
+
+        transaction = RoleTransaction(member)
+        if not transaction.current_roles.issuperset(change.remove):
+            # Either already applied before a restart, or changed by hand since.
+            log.trace("%s's roles changed since planning, skipping them", member)
+            return True
+
+        transaction.remove(*change.remove).add(*change.add)
+        if not transaction.changed:
+            return True
+
+        return await self._commit(transaction)
+
+    async def _commit(self, transaction: RoleTransaction) -> bool:
+        """Commit a role transaction, retrying on rate limits and server errors."""
+        member = transaction.member
+        for attempt in range(MAX_RETRIES):
+            try:
+                await transaction.commit(reason=self.reason)
+            except (discord.Forbidden, discord.NotFound) as e:
+                log.warning(f"Could not update {member}'s roles: {e}")
+                return False
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    log.warning(f"Could not update {member}'s roles: {e}")
+                    return False
+                log.info(f"Retrying {member} after HTTP {e.status} (try {attempt})")
+                await asyncio.sleep(2 ** attempt)
+            else:
+                log.trace("Updated %s's roles in job `%s`", member, self.name)
+                return True
+
+        return False
+
+    async def _send_progress(
+        self, channel: typing.Optional[discord.abc.Messageable]
+    ) -> typing.Optional[discord.Message]:
+        """Send the progress message, or log the progress if it can't be sent."""
+        if channel is not None:
+            try:
+                return await channel.send(self._progress_text())
+            except discord.HTTPException as e:
+                log.warning(f"Could not send progress message: {e}")
+        else:
+            log.warning(f"Channel of job `{self.name}` is gone, logging progress")
+        log.info(self._progress_text())
+        return None
+
+    async def _edit_progress(
+        self, message: typing.Optional[discord.Message], finished: bool = False
+    ) -> None:
+        """Update the progress message, or log the progress if there is none."""
+        if message is None:
+            log.info(self._progress_text(finished))
+            return
+        try:
+            await message.edit(content=self._progress_text(finished))
+        except discord.HTTPException as e:
+            log.warning(f"Could not update progress message: {e}")
+
+    async def _report_progress(self, message: typing.Optional[discord.Message]) -> None:
+        """Periodically update the progress message and save a checkpoint."""
+        set_priority(BACKGROUND)
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            self.save_checkpoint()
+            await self._edit_progress(message)
+
+    def _progress_text(self, finished: bool = False) -> str:
+        """Build the progress message for this job."""
+        percent = self.done / self.total * 100 if self.total else 100.0
+        text = f"`{self.name}`: {self.done}/{self.total} members ({percent:.0f}%)"
+
+        if finished:
+            text += f", finished. {len(self.failed)} failed."
+            if self.failed:
+                text += " Failed: " + ", ".join(f"<@{id_}>" for id_ in self.failed)
+            return text[:2000]
+
+        if self._done_this_run and self._started is not None:
+            rate = self._done_this_run / (time.monotonic() - self._started)
+            text += f", ETA {_format_duration(len(self._pending) / rate)}"
+        return text
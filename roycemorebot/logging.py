@@ -1,6 +1,11 @@
+import atexit
+import gzip
 import logging
 import os
+import queue
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from logging import Logger, handlers
 from pathlib import Path
 
@@ -10,12 +15,18 @@
 
 TRACE_LEVEL = 5
 
+# Compresses rotated log files, so rotating never waits on gzip.
+_compression_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="log-compression"
+)
+
 
 def setup() -> None:
     """Set up loggers."""
     logging.TRACE = TRACE_LEVEL
     logging.addLevelName(TRACE_LEVEL, "TRACE")
-    Logger.trace = _monkeypatch_trace
+    # Outside of debug mode, tracing is a no-op that doesn't even check the level.
+    Logger.trace = _monkeypatch_trace if constants.DEBUG_MODE else _disabled_trace
 
     log_level = TRACE_LEVEL if constants.DEBUG_MODE else logging.INFO
     format_string = "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
@@ -27,10 +38,12 @@ def setup() -> None:
         log_file, maxBytes=5242880, backupCount=7, encoding="utf8"
     )
     file_handler.setFormatter(log_format)
+    if constants.Logging.compress_rotated_logs:
+        file_handler.namer = _gzip_namer
+        file_handler.rotator = _gzip_rotator
 
     root_log = logging.getLogger()
     root_log.setLevel(log_level)
-    root_log.addHandler(file_handler)
 
     if "COLOREDLOGS_LEVEL_STYLES" not in os.environ:
         coloredlogs.DEFAULT_LEVEL_STYLES = {
@@ -46,7 +59,23 @@ def setup() -> None:
     if "COLOREDLOGS_LOG_LEVEL" not in os.environ:
         coloredlogs.DEFAULT_LOG_LEVEL = log_level
 
+    # Let coloredlogs build its handler, but take it off the root logger so that
+    # it's only ever called from the listener thread.
+    old_handlers = list(root_log.handlers)
     coloredlogs.install(logger=root_log, stream=sys.stdout)
+    stream_handlers = [h for h in root_log.handlers if h not in old_handlers]
+    for handler in stream_handlers:
+        root_log.removeHandler(handler)
+
+    # Records are only put in a queue on the event loop, and all the formatting
+    # and writing happens in the listener's thread.
+    log_queue = queue.Queue(maxsize=constants.Logging.queue_size)
+    root_log.addHandler(DroppingQueueHandler(log_queue))
+    listener = handlers.QueueListener(
+        log_queue, file_handler, *stream_handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
 
     logging.getLogger("discord").setLevel(logging.WARNING)
 
@@ -61,3 +90,84 @@ def _monkeypatch_trace(self: logging.Logger, msg: str, *args, **kwargs) -> None:
     """
     if self.isEnabledFor(TRACE_LEVEL):
         self._log(TRACE_LEVEL, msg, args, **kwargs)
+
+
+def _disabled_trace(self: logging.Logger, msg: str, *args, **kwargs) -> None:
+    """
+    Ignore a 'TRACE' message, used when not in debug mode.
+
+    Pass anything expensive to format as arguments instead of building the
+    message with an f-string, so it's never formatted when tracing is disabled:
+    logger.trace("Roles: %s", member.roles)
+    """
+
+
+class DroppingQueueHandler(handlers.QueueHandler):
+    """
+    Queue handler that never blocks, dropping records when its queue is full.
+
+    Records below `WARNING` are dropped first. More important records evict the
+    oldest queued record instead. The number of dropped records is logged once
+    the queue has room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the message and arguments, but leave formatting to the listener."""
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put a record in the queue without blocking."""
+        if self.dropped and not self.queue.full():
+            dropped, self.dropped = self.dropped, 0
+            self.queue.put_nowait(
+                logging.makeLogRecord(
+                    {
+                        "name": __name__,
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": f"Dropped {dropped} log records, the queue was full",
+                    }
+                )
+            )
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+
+def _gzip_namer(name: str) -> str:
+    """Name rotated log files as gzip files."""
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Move the log file out of the way, and compress it in the background."""
+    uncompressed = dest[: -len(".gz")]
+    os.replace(source, uncompressed)
+    _compression_executor.submit(_gzip_file, uncompressed, dest)
+
+
+def _gzip_file(source: str, dest: str) -> None:
+    """Compress a file with gzip, then delete the original."""
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
@@ -0,0 +1,230 @@
+import functools
+import logging
+import re
+import typing
+from collections import Counter
+
+import discord
+
+from fuzzywuzzy import fuzz, process
+
+log = logging.getLogger(__name__)
+
+SCORE_CUTOFF = 75
+RUN_SCORE_CUTOFF = 90  # for several words matched as one name, against whole names
+MAX_CANDIDATES = 25
+CACHE_SIZE = 512
+# Words in names like `chess club`, which don't name a role.
+FILLER_WORDS = {"club", "announcement", "announcements", "and"}
+
+
+def normalize(name: str) -> str:
+    """Normalize a name for matching, e.g. `Chess_Club!` -> `chess club`."""
+    return " ".join(re.split(r"[^a-z0-9]+", name.lower())).strip()
+
+
+def _strip_filler(normalized: str) -> str:
+    """Remove the filler words of a normalized name, e.g. `chess club` -> `chess`."""
+    return " ".join(word for word in normalized.split() if word not in FILLER_WORDS)
+
+
+def _ngrams(text: str, n: int = 3) -> "set[str]":
+    """Return the set of character n-grams of a string, padded at the start."""
+    padded = " " * (n - 1) + text
+    return {padded[i : i + n] for i in range(len(padded) - n + 1)}
+
+
+class AnnouncementMatcher:
+    """
+    Fuzzy matcher from user input to announcement role names.
+
+    Everything that only depends on the announcement roles (normalized names,
+    aliases and an n-gram index of them) is computed once when the matcher is
+    built. Queries are first narrowed down to the aliases sharing the most
+    n-grams with them before running the full fuzzy scorer, and recent results
+    are cached. Filler words like `club` are left out of fuzzy matching on both
+    sides, so they can't make a query match a role they don't name. Build a new
+    matcher whenever the announcement roles change.
+    """
+
+    def __init__(
+        self, announcement_roles: "dict[str, dict[str, typing.Union[int, bool]]]"
+    ):
+        self._aliases = {}  # normalized alias -> announcement role name
+        # Aliases without filler words -> announcement role name, for fuzzy
+        # matching, so a query like `announce` can't partially match a suffix.
+        self._fuzzy_aliases = {}
+        for name, info in announcement_roles.items():
+            for alias in self._aliases_of(name, info["club"]):
+                self._aliases.setdefault(alias, name)
+                if _strip_filler(alias):
+                    self._fuzzy_aliases.setdefault(_strip_filler(alias), name)
+        # Keywords for groups of announcement roles -> their names
+        self._groups = {
+            "all": list(announcement_roles),
+            "clubs": [
+                name for name, info in announcement_roles.items() if info["club"]
+            ],
+        }
+
+        self._max_words = max(
+            (len(alias.split()) for alias in self._aliases), default=1
+        )
+
+        self._ngram_index = {}  # n-gram -> aliases containing it
+        for alias in self._fuzzy_aliases:
+            for ngram in _ngrams(alias):
+                self._ngram_index.setdefault(ngram, []).append(alias)
+
+        self.match = functools.lru_cache(maxsize=CACHE_SIZE)(self._match)
+        log.trace("Built announcement matcher with %s aliases", len(self._aliases))
+
+    @staticmethod
+    def _aliases_of(name: str, club: bool) -> "list[str]":
+        """Return all the normalized names an announcement role can be called by."""
+        base = normalize(name)
+        aliases = [base, base.replace(" ", ""), f"{base} announcements"]
+        if club:
+            aliases += [f"{base} club", f"{base} club announcements"]
+        return aliases
+
+    def _candidates(self, query: str) -> "list[str]":
+        """Return the fuzzy aliases most likely to match a stripped query."""
+        overlap = Counter()
+        for ngram in _ngrams(query):
+            overlap.update(self._ngram_index.get(ngram, ()))
+        return [alias for alias, _ in overlap.most_common(MAX_CANDIDATES)]
+
+    def _match(self, query: str) -> "typing.Optional[tuple[str, int]]":
+        """Return the best matching announcement role name and its score."""
+        normalized = normalize(query)
+        if normalized in self._aliases:
+            return self._aliases[normalized], 100
+
+        stripped = _strip_filler(normalized)
+        if not stripped:
+            return None
+        match_info = process.extractOne(
+            stripped, self._candidates(stripped), score_cutoff=SCORE_CUTOFF
+        )
+        if match_info is None:
+            return None
+        return self._fuzzy_aliases[match_info[0]], match_info[1]
+
+    def _match_run(
+        self, queries: "list[str]", start: int
+    ) -> "typing.Optional[tuple[str, int]]":
+        """
+        Match the longest run of two or more queries from `start` as one name.
+
+        Returns the matched announcement role name and the length of the run.
+        Runs are compared with the whole of an alias, not just a part of it, so
+        `chess drama` doesn't match chess, but `student counsil` does match
+        student council.
+        """
+        longest = min(self._max_words, len(queries) - start)
+        for length in range(longest, 1, -1):
+            run = normalize(" ".join(queries[start : start + length]))
+            if run in self._aliases:
+                return self._aliases[run], length
+            stripped = _strip_filler(run)
+            if not stripped:
+                continue
+            match_info = process.extractOne(
+                stripped,
+                self._candidates(stripped),
+                scorer=fuzz.ratio,
+                score_cutoff=RUN_SCORE_CUTOFF,
+            )
+            if match_info is not None:
+                return self._fuzzy_aliases[match_info[0]], length
+        return None
+
+    def match_all(self, queries: typing.Iterable[str]) -> "tuple[list[str], list[str]]":
+        """
+        Match queries in one go, returning matched names and unmatched queries.
+
+        Unquoted names of several words arrive as one query per word, so runs
+        of consecutive queries are matched first, longest first, and only count
+        if they're close to a whole announcement role name. The queries left are
+        fuzzy matched one by one, so `student council` isn't matched word by
+        word. The keywords `all` and `clubs` match every announcement role and
+        every club's, and filler words like `club` on their own are skipped.
+        Names are returned once each, in the order matched.
+        """
+        queries = list(queries)
+        names = {}  # used as an ordered set
+        unmatched = []
+        i = 0
+        while i < len(queries):
+            run_match = self._match_run(queries, i)
+            if run_match is not None:
+                name, length = run_match
+                log.trace("Matched %s queries from %s as %s", length, i, name)
+                names[name] = None
+                i += length
+                continue
+
+            query = queries[i]
+            i += 1
+            normalized = normalize(query)
+            if normalized in self._groups:
+                names.update(dict.fromkeys(self._groups[normalized]))
+            elif normalized and normalized not in FILLER_WORDS:
+                match_info = self.match(query)
+                log.trace("Match info for %s: %s", query, match_info)
+                if match_info is None:
+                    unmatched.append(query)
+                else:
+                    names[match_info[0]] = None
+        return list(names), unmatched
+
+
+class RoleNameIndex:
+    """
+    Index of a guild's roles by the club slug their names start with.
+
+    A role's slug is the first word of its name, lowercased, which is the name of
+    the club channel it belongs to, e.g. `Model-Un Club Announcements` and
+    `Model-Un Club Leader` both belong to the `model-un` channel.
+
+    Keep the index up to date with `add` and `remove` as roles are created,
+    renamed and deleted, instead of building it again.
+    """
+
+    def __init__(self, roles: typing.Iterable[discord.Role]):
+        self._by_slug = {}
+        for role in roles:
+            self.add(role)
+
+    def add(self, role: discord.Role) -> None:
+        """Add a role under the slug of its name."""
+        self._by_slug.setdefault(self.slug(role.name), []).append(role)
+
+    def remove(self, role_id: int, name: str) -> None:
+        """Remove a role, by its ID and the name it was indexed under."""
+        slug = self.slug(name)
+        roles = [role for role in self._by_slug.get(slug, ()) if role.id != role_id]
+        if roles:
+            self._by_slug[slug] = roles
+        else:
+            self._by_slug.pop(slug, None)
+
+    @staticmethod
+    def slug(role_name: str) -> str:
+        """Return the slug of a role name."""
+        return role_name.split(" ", 1)[0].lower()
+
+    def announcement_role(self, slug: str) -> typing.Optional[discord.Role]:
+        """Return the announcement role of a slug, if there is one."""
+        for role in self._by_slug.get(slug, ()):
+            if "Announcements" in role.name:
+                return role
+        return None
+
+    def leader_role(self, slug: str) -> typing.Optional[discord.Role]:
+        """Return the leader role of a slug, if there is one."""
+        for role in self._by_slug.get(slug, ()):
+            if "Announcements" not in role.name:
+                return role
+        return None
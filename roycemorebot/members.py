@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import sys
+import time
+import typing
+from array import array
+
+import discord
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+_chunk_tasks = {}  # guild ID -> task chunking the guild
+
+
+class MemberRecord:
+    """The roles and flags of a member, without the rest of a `discord.Member`."""
+
+    __slots__ = ("role_ids", "pending", "bot")
+
+    def __init__(self, role_ids: typing.Iterable[int], pending: bool, bot: bool):
+        self.role_ids = array("Q", sorted(role_ids))  # Without `@everyone`
+        self.pending = pending
+        self.bot = bot
+
+    @classmethod
+    def from_data(cls: "type[MemberRecord]", data: dict) -> "MemberRecord":
+        """Create a record from a gateway member payload."""
+        return cls(
+            map(int, data["roles"]),
+            data.get("pending", False),
+            data["user"].get("bot", False),
+        )
+
+
+class MemberStore:
+    """
+    The roles of the members of each guild, stored compactly.
+
+    With the compact cache profile discord.py doesn't keep members, so this is
+    kept up to date from the gateway instead. A record takes about a hundred
+    bytes plus eight per role, where a cached member also keeps a
+    `discord.Member` and a `discord.User` with their names, avatars and more.
+    """
+
+    def __init__(self):
+        self._guilds = {}  # guild ID -> member ID -> MemberRecord
+        self._complete = set()  # IDs of the guilds with every member stored
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._guilds.values())
+
+    def records(self, guild_id: int) -> "dict[int, MemberRecord]":
+        """Return the records of a guild's stored members, by member ID."""
+        return self._guilds.get(guild_id, {})
+
+    def get(self, guild_id: int, member_id: int) -> typing.Optional[MemberRecord]:
+        """Return the record of a member, if they are stored."""
+        return self._guilds.get(guild_id, {}).get(member_id)
+
+    def is_complete(self, guild_id: int) -> bool:
+        """Return whether every member of a guild is stored."""
+        return guild_id in self._complete
+
+    def mark_complete(self, guild_id: int) -> None:
+        """Mark every member of a guild as stored, after chunking it."""
+        self._complete.add(guild_id)
+
+    def update(self, guild_id: int, data: dict) -> typing.Optional[MemberRecord]:
+        """Store a member from a gateway payload, returning their old record."""
+        records = self._guilds.setdefault(guild_id, {})
+        member_id = int(data["user"]["id"])
+        old = records.get(member_id)
+        records[member_id] = MemberRecord.from_data(data)
+        return old
+
+    def remove(self, guild_id: int, member_id: int) -> None:
+        """Forget a member who left a guild."""
+        self._guilds.get(guild_id, {}).pop(member_id, None)
+
+    def remove_role(self, guild_id: int, role_id: int) -> None:
+        """Remove a deleted role from every member of a guild."""
+        for record in self._guilds.get(guild_id, {}).values():
+            if role_id in record.role_ids:
+                record.role_ids.remove(role_id)
+
+    def clear(self, guild_id: int) -> None:
+        """Forget every member of a guild."""
+        self._guilds.pop(guild_id, None)
+        self._complete.discard(guild_id)
+
+    def memory_usage(self) -> int:
+        """Estimate the memory used by the store, in bytes."""
+        size = sys.getsizeof(self._guilds)
+        for records in self._guilds.values():
+            size += sys.getsizeof(records)
+            for member_id, record in records.items():
+                size += (
+                    sys.getsizeof(member_id)
+                    + sys.getsizeof(record)
+                    + sys.getsizeof(record.role_ids)
+                )
+        return size
+
+
+store = MemberStore()
+
+
+class StoredMember:
+    """
+    A member known only from the member store.
+
+    This has just enough of `discord.Member` to change the member's roles with
+    a `RoleTransaction`, without fetching the whole member first.
+    """
+
+    __slots__ = ("guild", "id", "record")
+
+    def __init__(self, guild: discord.Guild, member_id: int, record: MemberRecord):
+        self.guild = guild
+        self.id = member_id
+        self.record = record
+
+    def __str__(self) -> str:
+        return f"member {self.id}"
+
+    @property
+    def role_ids(self) -> "array[int]":
+        """Return the IDs of the member's roles, except `@everyone`."""
+        return self.record.role_ids
+
+    async def edit(
+        self,
+        *,
+        roles: "list[discord.abc.Snowflake]",
+        reason: typing.Optional[str] = None,
+    ) -> None:
+        """Replace the member's roles."""
+        await self.guild._state.http.edit_member(
+            self.guild.id, self.id, roles=[role.id for role in roles], reason=reason
+        )
+
+    async def add_roles(
+        self, *roles: discord.abc.Snowflake, reason: typing.Optional[str] = None
+    ) -> None:
+        """Add roles to the member, one request each."""
+        for role in roles:
+            await self.guild._state.http.add_role(
+                self.guild.id, self.id, role.id, reason=reason
+            )
+
+    async def remove_roles(
+        self, *roles: discord.abc.Snowflake, reason: typing.Optional[str] = None
+    ) -> None:
+        """Remove roles from the member, one request each."""
+        for role in roles:
+            await self.guild._state.http.remove_role(
+                self.guild.id, self.id, role.id, reason=reason
+            )
+
+
+def get_member(
+    guild: discord.Guild, member_id: int
+) -> typing.Union[discord.Member, StoredMember, None]:
+    """Get a member from the member cache, or else from the member store."""
+    member = guild.get_member(member_id)
+    if member is None:
+        record = store.get(guild.id, member_id)
+        if record is not None:
+            return StoredMember(guild, member_id, record)
+    return member
+
+
+def is_chunked(guild: discord.Guild) -> bool:
+    """Return whether every member of a guild is cached or stored."""
+    return guild.chunked or store.is_complete(guild.id)
+
+
+async def ensure_chunked(guild: discord.Guild) -> None:
+    """
+    Make sure every member of a guild is cached, requesting them if needed.
+
+    The bot doesn't chunk guilds at startup unless configured to, so anything
+    that needs every member, like a bulk role job, must call this first.
+    Concurrent calls for the same guild share a single request. With the
+    compact cache profile the members end up in the member store instead.
+    """
+    if is_chunked(guild):
+        return
+
+    task = _chunk_tasks.get(guild.id)
+    if task is None or task.done():
+        task = asyncio.get_event_loop().create_task(_chunk(guild))
+        _chunk_tasks[guild.id] = task
+    await asyncio.shield(task)
+
+
+async def _chunk(guild: discord.Guild) -> None:
+    """Request every member of a guild, logging how long it took."""
+    log.info(f"Requesting the members of {guild}")
+    start = time.perf_counter()
+    cache = guild._state.member_cache_flags.joined
+    await guild.chunk(cache=cache)
+    if not cache:
+        store.mark_complete(guild.id)
+
+    log.info(
+        f"{'Cached' if cache else 'Stored'} "
+        + f"{len(guild.members) if cache else len(store.records(guild.id))} "
+        + f"members of {guild} in {time.perf_counter() - start:.1f}s"
+    )
+
+
+def _hook(parsers: dict, event: str) -> typing.Callable:
+    """Wrap the parser of a gateway event, which is passed to the wrapper."""
+
+    def decorator(func: typing.Callable) -> typing.Callable:
+        parse = parsers[event]
+        parsers[event] = lambda data: func(parse, data)
+        return func
+
+    return decorator
+
+
+def install(bot: commands.Bot, compact: bool) -> None:
+    """
+    Wrap the gateway event parsers to dispatch the member events discord.py drops.
+
+    discord.py caches members whose update it sees but drops the update itself,
+    because it has nothing to compare them with, and only dispatches removals of
+    cached members. Without chunking at startup that is most members, so this
+    dispatches `uncached_member_update` with the new member and their old
+    record, if stored, and `uncached_member_remove` with the guild and member ID.
+    With `compact`, the member store is kept up to date as well.
+    """
+    state = bot._connection
+    parsers = state.parsers
+
+    @_hook(parsers, "GUILD_MEMBER_UPDATE")
+    def parse_member_update(parse: typing.Callable, data: dict) -> None:
+        guild = bot.get_guild(int(data["guild_id"]))
+        member_id = int(data["user"]["id"])
+        was_cached = guild is not None and guild.get_member(member_id) is not None
+        old = store.update(guild.id, data) if compact and guild is not None else None
+        parse(data)
+
+        if guild is not None and not was_cached:
+            member = guild.get_member(member_id) or discord.Member(
+                data=data, guild=guild, state=state
+            )
+            bot.dispatch("uncached_member_update", member, old)
+
+    @_hook(parsers, "GUILD_MEMBER_REMOVE")
+    def parse_member_remove(parse: typing.Callable, data: dict) -> None:
+        guild = bot.get_guild(int(data["guild_id"]))
+        member_id = int(data["user"]["id"])
+        was_cached = guild is not None and guild.get_member(member_id) is not None
+        if compact and guild is not None:
+            store.remove(guild.id, member_id)
+        parse(data)
+
+        if guild is not None and not was_cached:
+            bot.dispatch("uncached_member_remove", guild, member_id)
+
+    if compact:
+        _keep_store_updated(parsers)
+
+
+def _keep_store_updated(parsers: dict) -> None:
+    """Wrap the gateway event parsers to keep the member store up to date."""
+
+    @_hook(parsers, "GUILD_CREATE")
+    def parse_guild_create(parse: typing.Callable, data: dict) -> None:
+        # Anything stored may be outdated after reconnecting.
+        guild_id = int(data["id"])
+        store.clear(guild_id)
+        for member_data in data.get("members", ()):
+            store.update(guild_id, member_data)
+        parse(data)
+
+    @_hook(parsers, "GUILD_DELETE")
+    def parse_guild_delete(parse: typing.Callable, data: dict) -> None:
+        store.clear(int(data["id"]))
+        parse(data)
+
+    @_hook(parsers, "GUILD_MEMBER_ADD")
+    def parse_member_add(parse: typing.Callable, data: dict) -> None:
+        store.update(int(data["guild_id"]), data)
+        parse(data)
+
+    @_hook(parsers, "GUILD_MEMBERS_CHUNK")
+    def parse_members_chunk(parse: typing.Callable, data: dict) -> None:
+        # Before parsing, which finishes the chunk request with the last chunk.
+        guild_id = int(data["guild_id"])
+        for member_data in data.get("members", ()):
+            store.update(guild_id, member_data)
+        parse(data)
+
+    @_hook(parsers, "GUILD_ROLE_DELETE")
+    def parse_role_delete(parse: typing.Callable, data: dict) -> None:
+        store.remove_role(int(data["guild_id"]), int(data["role_id"]))
+        parse(data)
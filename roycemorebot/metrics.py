@@ -0,0 +1,205 @@
+import bisect
+import collections
+import logging
+import os
+import resource
+import sys
+import typing
+
+log = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RESERVOIR_SIZE = 1024  # Recent samples kept for percentiles
+
+
+class Counter:
+    """A value that only goes up."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        """Increment the counter."""
+        self.value += amount
+
+
+class Gauge:
+    """A value that can go up and down."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:  # noqa: A003
+        """Set the gauge."""
+        self.value = value
+
+
+class Histogram:
+    """
+    Distribution of observed values.
+
+    Keeps cumulative bucket counts for exporting, and a reservoir of the most
+    recent samples to compute percentiles from.
+    """
+
+    __slots__ = ("buckets", "bucket_counts", "count", "sum", "_samples")
+
+    def __init__(self, buckets: "tuple[float, ...]" = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._samples = collections.deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.count += 1
+        self.sum += value
+        self._samples.append(value)
+        for i in range(bisect.bisect_left(self.buckets, value), len(self.buckets)):
+            self.bucket_counts[i] += 1
+
+    def percentile(self, percent: float) -> typing.Optional[float]:
+        """Return a percentile of the recent samples, or None if there are none."""
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        index = min(len(samples) - 1, int(len(samples) * percent / 100))
+        return samples[index]
+
+
+class Registry:
+    """A collection of named, labelled counters, gauges and histograms."""
+
+    def __init__(self):
+        self.counters = {}  # name -> labels -> Counter
+        self.gauges = {}  # name -> labels -> Gauge
+        self.histograms = {}  # name -> labels -> Histogram
+
+    @staticmethod
+    def _labels(labels: "dict[str, typing.Any]") -> "tuple[tuple[str, str], ...]":
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def counter(self, name: str, **labels) -> Counter:
+        """Get a counter, creating it if needed."""
+        by_labels = self.counters.setdefault(name, {})
+        key = self._labels(labels)
+        if key not in by_labels:
+            by_labels[key] = Counter()
+        return by_labels[key]
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        """Get a gauge, creating it if needed."""
+        by_labels = self.gauges.setdefault(name, {})
+        key = self._labels(labels)
+        if key not in by_labels:
+            by_labels[key] = Gauge()
+        return by_labels[key]
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        """Get a histogram, creating it if needed."""
+        by_labels = self.histograms.setdefault(name, {})
+        key = self._labels(labels)
+        if key not in by_labels:
+            by_labels[key] = Histogram()
+        return by_labels[key]
+
+
+registry = Registry()
+
+PROMETHEUS_PREFIX = "roycemorebot_"
+
+
+def _format_labels(labels: "tuple[tuple[str, str], ...]") -> str:
+    """Format labels for the Prometheus text format."""
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render_prometheus(registry: Registry = registry) -> str:
+    """Render all the metrics of a registry in the Prometheus text format."""
+    lines = []
+    for kind, metrics in (("counter", registry.counters), ("gauge", registry.gauges)):
+        for name, by_labels in sorted(metrics.items()):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} {kind}")
+            for labels, metric in by_labels.items():
+                lines.append(
+                    f"{PROMETHEUS_PREFIX}{name}{_format_labels(labels)} {metric.value}"
+                )
+
+    for name, by_labels in sorted(registry.histograms.items()):
+        name = PROMETHEUS_PREFIX + name
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in by_labels.items():
+            for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                bucket_labels = _format_labels(labels + (("le", str(bound)),))
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            inf_labels = _format_labels(labels + (("le", "+Inf"),))
+            lines.append(f"{name}_bucket{inf_labels} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def rss() -> int:
+    """Return the resident set size of the process, in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # Not Linux
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Return the peak resident set size of the process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def observe_command(name: str, seconds: float, failed: bool) -> None:
+    """Record a command invocation."""
+    registry.counter("commands_total", command=name).inc()
+    if failed:
+        registry.counter("command_errors_total", command=name).inc()
+    registry.histogram("command_duration_seconds", command=name).observe(seconds)
+
+
+def observe_request(method: str, route: str) -> None:
+    """Record a request to the Discord API."""
+    registry.counter("http_requests_total", method=method, route=route).inc()
+
+
+def observe_listener(name: str, seconds: float) -> None:
+    """Record a run of an event listener."""
+    registry.histogram("listener_duration_seconds", listener=name).observe(seconds)
+
+
+class RateLimitHandler(logging.Handler):
+    """Count the rate limits discord.py hits, from its log messages."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Count a rate limit if the record is about one."""
+        if not isinstance(record.msg, str):
+            return
+        if record.msg.startswith("We are being rate limited"):
+            registry.counter("rate_limits_total", scope="bucket").inc()
+        elif record.msg.startswith("Global rate limit has been hit"):
+            registry.counter("rate_limits_total", scope="global").inc()
+
+
+def install_rate_limit_handler() -> None:
+    """Start counting rate limits."""
+    http_log = logging.getLogger("discord.http")
+    if not any(isinstance(handler, RateLimitHandler) for handler in http_log.handlers):
+        http_log.addHandler(RateLimitHandler(logging.WARNING))
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import typing
+import weakref
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+_stores = weakref.WeakSet()  # so that every store can be flushed on shutdown
+
+
+class JSONStore:
+    """
+    A JSON file that is written atomically and off the event loop.
+
+    Calls to `save` are debounced: the data is written once `debounce` seconds
+    after the first call, so a burst of saves only causes a single write of the
+    latest data. Writes go to a temporary file which is then renamed over the
+    real one, and the previous versions of the file are kept as numbered
+    backups (`file.json.bak.1` being the newest) which `load` falls back to if
+    the file itself is missing or corrupted.
+
+    Data passed to `save` is serialized in a worker thread, so it must not be
+    mutated afterwards. Pass a new object (or a copy) each time instead.
+    """
+
+    def __init__(self, path: Path, debounce: float = 1.0, backups: int = 3):
+        self.path = Path(path)
+        self.debounce = debounce
+        self.backups = backups
+
+        self._pending = _MISSING
+        self._task = None
+        self._lock = asyncio.Lock()
+        _stores.add(self)
+
+    def _backup_path(self, version: int) -> Path:
+        """Return the path of a backup of the file."""
+        return self.path.with_name(f"{self.path.name}.bak.{version}")
+
+    def load(self, default: typing.Any = None) -> typing.Any:
+        """
+        Load the data in the file, blocking until it is read.
+
+        Only use this where blocking is fine, like at startup before the bot
+        connects. Otherwise, use `load_async`.
+        """
+        for path in [self.path] + [
+            self._backup_path(version) for version in range(1, self.backups + 1)
+        ]:
+            if not path.is_file():
+                continue
+
+            try:
+                with path.open("r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                log.error(f"Could not load `{path}`, trying older backups: {e}")
+            else:
+                if path != self.path:
+                    log.warning(f"Loaded `{self.path}` from backup `{path}`")
+                return data
+
+        return default
+
+    async def load_async(self, default: typing.Any = None) -> typing.Any:
+        """Load the data in the file without blocking the event loop."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.load, default)
+
+    def save(self, data: typing.Any) -> None:
+        """Schedule writing data to the file."""
+        self._pending = data
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._save_later())
+
+    async def flush(self) -> None:
+        """Write any pending data to the file now."""
+        async with self._lock:
+            data, self._pending = self._pending, _MISSING
+            if data is _MISSING:
+                return
+
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(None, self._write, data)
+            except (OSError, TypeError, ValueError):
+                log.exception(f"Could not save `{self.path}`")
+
+    async def delete(self) -> None:
+        """Delete the file and its backups, dropping any pending data."""
+        async with self._lock:
+            self._pending = _MISSING
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._delete)
+
+    async def _save_later(self) -> None:
+        """Write the pending data after the debounce delay."""
+        while self._pending is not _MISSING:
+            await asyncio.sleep(self.debounce)
+            await self.flush()
+
+    def _write(self, data: typing.Any) -> None:
+        """Atomically write data to the file, keeping backups of old versions."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.path.with_name(f"{self.path.name}.tmp")
+        with temp_file.open("w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self.backups and self.path.is_file():
+            for version in range(self.backups - 1, 0, -1):
+                if self._backup_path(version).is_file():
+                    os.replace(
+                        self._backup_path(version), self._backup_path(version + 1)
+                    )
+            # Linked or copied rather than moved, so the file always exists.
+            backup = self._backup_path(1)
+            if backup.exists():
+                backup.unlink()
+            try:
+                os.link(self.path, backup)
+            except OSError:
+                shutil.copy2(self.path, backup)
+
+        os.replace(temp_file, self.path)
+        log.trace("Saved `%s`", self.path)
+
+    def _delete(self) -> None:
+        """Delete the file and its backups."""
+        for path in [self.path] + [
+            self._backup_path(version) for version in range(1, self.backups + 1)
+        ]:
+            if path.is_file():
+                path.unlink()
+
+
+async def flush_all() -> None:
+    """Write the pending data of every store."""
+    await asyncio.gather(*(store.flush() for store in _stores))
@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import time
+import typing
+
+from roycemorebot.metrics import observe_request, registry
+
+log = logging.getLogger(__name__)
+
+# Request priorities, most urgent first.
+INTERACTIVE = 0  # commands run by members, the default
+BACKGROUND = 1  # work members aren't waiting on, like welcome messages
+BULK = 2  # jobs changing many members at once
+PRIORITY_NAMES = ("interactive", "background", "bulk")
+
+_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+def set_priority(level: int) -> None:
+    """
+    Send the API requests made by the current task with a priority.
+
+    Each task has its own copy of the priority, so this is for tasks doing
+    only one kind of work, like background workers.
+    """
+    _priority.set(level)
+
+
+@contextlib.contextmanager
+def priority(level: int) -> typing.Iterator[None]:
+    """
+    Send the API requests made in this context with a priority.
+
+    Tasks created in the context inherit the priority.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RequestScheduler:
+    """
+    Order the API requests waiting for the same rate limit bucket by priority.
+
+    discord.py sends the requests of a bucket one at a time, in the order they
+    were made, so a member's role command would wait behind every queued
+    request of a bulk job editing members of the same guild. Here requests
+    wait for their turn in a priority queue per bucket instead, so the next
+    request sent is always the most urgent one, and bulk work only uses the
+    bucket when nothing more urgent is waiting.
+    """
+
+    def __init__(self):
+        self._busy = set()  # buckets with a request being sent
+        self._waiting = {}  # bucket -> heap of (priority, order, future)
+        self._order = itertools.count()
+
+    async def acquire(self, bucket: str, level: int) -> None:
+        """Wait until it's the turn of a request with a priority in a bucket."""
+        if bucket not in self._busy:
+            self._busy.add(bucket)
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(
+            self._waiting.setdefault(bucket, []), (level, next(self._order), future)
+        )
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(bucket)  # It was our turn, so pass it on
+            raise
+
+    def release(self, bucket: str) -> None:
+        """Give the turn in a bucket to the most urgent waiting request."""
+        heap = self._waiting.get(bucket)
+        while heap:
+            *_, future = heapq.heappop(heap)
+            if not future.done():  # Not cancelled while waiting
+                future.set_result(None)
+                return
+
+        self._waiting.pop(bucket, None)
+        self._busy.discard(bucket)
+
+
+scheduler = RequestScheduler()
+
+
+def install(http: typing.Any) -> None:
+    """
+    Schedule the requests of a `discord.http.HTTPClient` by priority.
+
+    The requests are also counted here, so that `HTTPClient.request` is only
+    wrapped once.
+    """
+    request = http.request
+
+    @functools.wraps(request)
+    async def scheduled_request(route: typing.Any, **kwargs) -> typing.Any:
+        observe_request(route.method, route.path)
+        level = _priority.get()
+        bucket = route.bucket
+        start = time.perf_counter()
+        await scheduler.acquire(bucket, level)
+        registry.histogram(
+            "request_queue_seconds", priority=PRIORITY_NAMES[level]
+        ).observe(time.perf_counter() - start)
+        try:
+            return await request(route, **kwargs)
+        finally:
+            scheduler.release(bucket)
+
+    http.request = scheduled_request
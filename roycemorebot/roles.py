@@ -0,0 +1,109 @@
+import logging
+import typing
+
+import discord
+
+from roycemorebot.members import StoredMember
+
+log = logging.getLogger(__name__)
+
+RoleLike = typing.Union[int, discord.abc.Snowflake]
+
+
+def _role_id(role: RoleLike) -> int:
+    """Return the ID of a role or role ID."""
+    return role if isinstance(role, int) else role.id
+
+
+class RoleTransaction:
+    """
+    A set of role changes for a member, applied with as few requests as possible.
+
+    Declare the roles to add and remove, then `commit` the transaction. The
+    member's new roles are computed from their cached roles, and nothing is sent
+    to Discord if they wouldn't change. Members only known from the member store
+    work as well, as `StoredMember`s.
+
+    A change of a single role, added or removed, is sent as Discord's per-role
+    add or remove request, which only touches that role. Any other change, like
+    replacing a class role or subscribing to many announcements, replaces the
+    member's whole role list with one request, so it's applied all at once. That
+    list is computed from the cache or store, so a role change made elsewhere
+    that the bot hasn't seen yet (another command, a moderator, a role menu
+    reaction or a bulk job) is undone by it.
+
+    Example Usage:
+        await RoleTransaction(member).remove(*CLASS_ROLES).add(role).commit(
+            reason="Class Roles"
+        )
+    """
+
+    def __init__(self, member: typing.Union[discord.Member, StoredMember]):
+        self.member = member
+        self._add = set()
+        self._remove = set()
+
+    def add(self, *roles: RoleLike) -> "RoleTransaction":
+        """Add roles to the member."""
+        for role_id in map(_role_id, roles):
+            self._add.add(role_id)
+            self._remove.discard(role_id)
+        return self
+
+    def remove(self, *roles: RoleLike) -> "RoleTransaction":
+        """Remove roles from the member."""
+        for role_id in map(_role_id, roles):
+            self._remove.add(role_id)
+            self._add.discard(role_id)
+        return self
+
+    def toggle(self, role: RoleLike) -> bool:
+        """
+        Add a role if the member doesn't have it, else remove it.
+
+        Returns whether the role will be added.
+        """
+        role_id = _role_id(role)
+        if role_id in self.current_roles:
+            self.remove(role_id)
+            return False
+        self.add(role_id)
+        return True
+
+    @property
+    def current_roles(self) -> "set[int]":
+        """Return the IDs of the member's current roles, except `@everyone`."""
+        if isinstance(self.member, StoredMember):
+            return set(self.member.role_ids)
+        return {role.id for role in self.member.roles[1:]}
+
+    @property
+    def roles(self) -> "set[int]":
+        """Return the IDs of the roles the member will have after committing."""
+        return (self.current_roles - self._remove) | self._add
+
+    @property
+    def changed(self) -> bool:
+        """Return whether committing would change the member's roles."""
+        return self.roles != self.current_roles
+
+    async def commit(self, reason: typing.Optional[str] = None) -> bool:
+        """Apply the changes, returning whether anything was changed."""
+        current_roles = self.current_roles
+        roles = self.roles
+        if roles == current_roles:
+            log.trace("Not changing %s's roles, nothing to change", self.member)
+            return False
+
+        added = roles - current_roles
+        removed = current_roles - roles
+        if len(added) == 1 and not removed:
+            await self.member.add_roles(*map(discord.Object, added), reason=reason)
+        elif len(removed) == 1 and not added:
+            await self.member.remove_roles(*map(discord.Object, removed), reason=reason)
+        else:
+            await self.member.edit(
+                roles=[discord.Object(role_id) for role_id in roles], reason=reason
+            )
+        log.trace("Changed %s's roles (%s)", self.member, reason)
+        return True
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import discord
+
+from roycemorebot.metrics import registry
+from roycemorebot.priorities import BACKGROUND, set_priority
+
+log = logging.getLogger(__name__)
+
+QUEUE_SIZE = 1000  # members waiting for a welcome message
+WORKERS = 2
+MAX_ATTEMPTS = 4
+BACKOFF = 5.0  # seconds before the first retry, doubled for every next one
+DEDUP_WINDOW = 24 * 60 * 60  # seconds in which a member is only welcomed once
+
+
+class WelcomeQueue:
+    """
+    Send welcome messages to newly verified members from a bounded queue.
+
+    A few workers send the messages, so a burst of verifications doesn't send
+    hundreds of DMs at once. Sends that fail because of rate limits or server
+    errors are retried with exponential backoff, and members with closed DMs
+    are skipped. A member is only welcomed once per `DEDUP_WINDOW`, however
+    often they flip from pending to verified. The embed is built once per
+    guild icon and reused, and the outcomes are counted in the metrics
+    registry as `welcome_messages_total`.
+    """
+
+    def __init__(self, description: str):
+        self._description = description
+        self._embeds = {}  # guild icon URL -> embed
+        self._queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._queued = set()  # IDs of the members queued or being welcomed
+        self._welcomed = OrderedDict()  # member ID -> when welcomed, oldest first
+        self._workers = []
+
+    @property
+    def description(self) -> str:
+        """The text of the welcome message."""
+        return self._description
+
+    @description.setter
+    def description(self, description: str) -> None:
+        self._description = description
+        self._embeds.clear()
+
+    def _embed(self, guild: discord.Guild) -> discord.Embed:
+        """Return the welcome embed of a guild, building it if needed."""
+        icon_url = str(guild.icon_url)
+        embed = self._embeds.get(icon_url)
+        if embed is None:
+            embed = discord.Embed(
+                color=discord.Colour.green(), description=self._description
+            ).set_author(
+                name="Welcome to the Roycemore Discord Server!", icon_url=icon_url
+            )
+            self._embeds[icon_url] = embed
+            log.trace("Built welcome embed with icon %s", icon_url)
+        return embed
+
+    def _count(self, result: str) -> None:
+        registry.counter("welcome_messages_total", result=result).inc()
+
+    def _recently_welcomed(self, member_id: int) -> bool:
+        """Return whether a member was welcomed within the dedup window."""
+        cutoff = time.monotonic() - DEDUP_WINDOW
+        while self._welcomed and next(iter(self._welcomed.values())) < cutoff:
+            self._welcomed.popitem(last=False)
+        return member_id in self._welcomed
+
+    def enqueue(self, member: discord.Member) -> bool:
+        """Queue a welcome message for a member, returning whether it was queued."""
+        if member.id in self._queued or self._recently_welcomed(member.id):
+            log.trace("Not welcoming %s again", member)
+            self._count("duplicate")
+            return False
+
+        if not self._workers:
+            self.start()
+        try:
+            self._queue.put_nowait((member, self._embed(member.guild)))
+        except asyncio.QueueFull:
+            log.warning(f"Welcome queue is full, not welcoming {member}")
+            self._count("dropped")
+            return False
+
+        self._queued.add(member.id)
+        log.info(f"Member {member} has just verified, queued a welcome message")
+        return True
+
+    def start(self) -> None:
+        """Start the workers sending welcome messages."""
+        loop = asyncio.get_event_loop()
+        self._workers = [loop.create_task(self._work()) for _ in range(WORKERS)]
+
+    def stop(self) -> None:
+        """Stop the workers, dropping the queued welcome messages."""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        if self._queue.qsize():
+            log.info(f"Dropped {self._queue.qsize()} queued welcome messages")
+
+    async def _work(self) -> None:
+        """Send welcome messages from the queue until cancelled."""
+        set_priority(BACKGROUND)
+        while True:
+            member, embed = await self._queue.get()
+            try:
+                delivered = await self._send(member, embed)
+            except Exception:
+                log.exception(f"Error sending {member} a welcome message")
+                delivered = False
+            finally:
+                self._queued.discard(member.id)
+                self._queue.task_done()
+
+            self._count("delivered" if delivered else "failed")
+            if delivered:
+                self._welcomed[member.id] = time.monotonic()
+
+    async def _send(self, member: discord.Member, embed: discord.Embed) -> bool:
+        """Send a member the welcome message, returning whether it was delivered."""
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                await member.send(embed=embed)
+            except discord.Forbidden:
+                log.info(f"Could not welcome {member}, their DMs are closed")
+                return False
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    log.warning(f"Could not welcome {member}: {e}")
+                    return False
+                if attempt < MAX_ATTEMPTS - 1:
+                    delay = BACKOFF * 2**attempt
+                    log.info(f"Retrying welcoming {member} in {delay:.0f}s: {e}")
+                    await asyncio.sleep(delay)
+            else:
+                log.trace("Welcomed %s", member)
+                return True
+
+        log.warning(f"Gave up welcoming {member} after {MAX_ATTEMPTS} attempts")
+        return False